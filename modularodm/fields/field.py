@@ -4,6 +4,7 @@ import copy
 import six
 
 from modularodm import exceptions
+from modularodm.frozen import is_frozen, thaw
 from modularodm.query.querydialect import DefaultQueryDialect as Q
 from .lists import List
 
@@ -116,7 +117,7 @@ class Field(object):
             # already associated with its key
             if obj._is_loaded:
                 unique_query = unique_query & Q(obj._primary_name, 'ne', obj._primary_key)
-            if obj.find(unique_query).limit(1).count():
+            if obj.find(unique_query, limit=1).count():
                 raise exceptions.ValidationValueError('Value must be unique')
 
         # Field-level validation
@@ -167,9 +168,14 @@ class Field(object):
         translator = translator or self._schema_class._translator
         if value == translator.null_value:
             return None
+        # Storage backends may share frozen records between readers; thawing
+        # makes the copy that would otherwise be made below
+        frozen = is_frozen(value)
+        if frozen:
+            value = thaw(value)
         method = self._get_translate_func(translator, 'from')
         value = value if method is None else method(value)
-        if self.mutable:
+        if self.mutable and not frozen:
             return copy.deepcopy(value)
         return value
 
@@ -192,6 +198,10 @@ class Field(object):
             instance._dirty = False
             instance.reload()
 
+        # Load if left out of a projection
+        if self._field_name in instance._deferred:
+            instance._load_deferred()
+
         # Impute default and return
         try:
             self.data[instance]
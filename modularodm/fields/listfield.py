@@ -5,6 +5,7 @@ import copy
 import six
 
 from modularodm import signals
+from modularodm.frozen import is_frozen, thaw
 from ..fields import Field
 from ..validators import validate_list
 
@@ -147,6 +148,10 @@ class ListField(Field):
         translator = translator or self._schema_class._translator
         if value:
             if self._uniform_translator:
+                # Thawing a frozen list already makes a deep copy
+                frozen = is_frozen(value)
+                if frozen:
+                    value = thaw(value)
                 method = self._get_translate_func(translator, 'from')
                 if method is not None or translator.null_value is not None:
                     value = [
@@ -157,6 +162,8 @@ class ListField(Field):
                         method(item)
                         for item in value
                     ]
+                if frozen:
+                    return value
                 if self._field_instance.mutable:
                     return copy.deepcopy(value)
                 return copy.copy(value)
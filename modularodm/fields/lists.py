@@ -31,11 +31,19 @@ class BaseForeignList(List):
     def _from_value(self, value):
         pass
 
+    @abc.abstractmethod
+    def _prefetch(self):
+        """Load the records referenced by the list that are not cached, with
+        one batch per collection.
+        """
+        pass
+
     def _to_data(self):
         return list(super(BaseForeignList, self).__iter__())
 
     def __iter__(self):
         if self:
+            self._prefetch()
             return (self[idx] for idx in range(len(self)))
         return iter([])
 
@@ -64,6 +72,11 @@ class ForeignList(BaseForeignList):
     def _to_primary_keys(self):
         return self._to_data()
 
+    def _prefetch(self):
+        keys = [key for key in self._to_primary_keys() if key is not None]
+        if keys:
+            self._base_class.load_many(keys)
+
     def __reversed__(self):
         return ForeignList(
             super(ForeignList, self).__reversed__(),
@@ -125,6 +138,15 @@ class AbstractForeignList(BaseForeignList):
             for item in self._to_data()
         ]
 
+    def _prefetch(self):
+        from modularodm import StoredObject
+        keys = {}
+        for item in self._to_data():
+            if item is not None and item[0] is not None:
+                keys.setdefault(item[1], []).append(item[0])
+        for name, collection_keys in keys.items():
+            StoredObject.get_collection(name).load_many(collection_keys)
+
     def __reversed__(self):
         return AbstractForeignList(
             super(AbstractForeignList, self).__reversed__()
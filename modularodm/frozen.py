@@ -1,33 +1,52 @@
 
-import collections
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
 
 def freeze(value):
     """ Cast value to its frozen counterpart. """
     if isinstance(value, list):
         return FrozenList(*value)
     if isinstance(value, dict):
-        return FrozenDict(**value)
+        return FrozenDict(value)
     return value
 
 def thaw(value):
-    if isinstance(value, FrozenList):
-        return value.thaw()
-    if isinstance(value, FrozenDict):
+    """ Cast value to a mutable copy if it is frozen. """
+    # Compare types exactly; `isinstance` on the ABCs is slow
+    if type(value) in _FROZEN_TYPES:
         return value.thaw()
     return value
 
-class FrozenDict(collections.Mapping):
-    """ Immutable dictionary. """
-    def __init__(self, **kwargs):
-        self.__data = {key : freeze(value) for key, value in kwargs.items()}
+def is_frozen(value):
+    return type(value) in _FROZEN_TYPES
+
+class FrozenDict(Mapping):
+    """ Immutable dictionary. Values that are already frozen are shared
+    rather than copied. """
+    def __init__(self, *args, **kwargs):
+        self.__data = {
+            key : freeze(value)
+            for key, value in dict(*args, **kwargs).items()
+        }
 
     def thaw(self):
         return {key : thaw(value) for key, value in self.__data.items()}
 
     def __eq__(self, other):
-        if not isinstance(other, FrozenDict):
-            return self.thaw() == other
-        return super(FrozenDict, self).__eq__(self, other)
+        if isinstance(other, FrozenDict):
+            return self.__data == other.__data
+        # Avoid thawing to compare with e.g. None
+        if not isinstance(other, Mapping):
+            return False
+        return self.thaw() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __reduce__(self):
+        return (FrozenDict, (self.__data,))
 
     def __getitem__(self, item):
         return self.__data[item]
@@ -41,7 +60,7 @@ class FrozenDict(collections.Mapping):
     def __repr__(self):
         return repr(self.__data)
 
-class FrozenList(collections.Sequence):
+class FrozenList(Sequence):
     """ Immutable list. """
     def __init__(self, *args):
         self.__data = [freeze(value) for value in args]
@@ -50,9 +69,17 @@ class FrozenList(collections.Sequence):
         return [thaw(value) for value in self.__data]
 
     def __eq__(self, other):
-        if not isinstance(other, FrozenList):
-            return self.thaw() == other
-        return super(FrozenList, self).__eq__(self, other)
+        if isinstance(other, FrozenList):
+            return self.__data == other.__data
+        if not isinstance(other, (list, tuple, Sequence)):
+            return False
+        return self.thaw() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __reduce__(self):
+        return (FrozenList, tuple(self.__data))
 
     def __getitem__(self, item):
         return self.__data[item]
@@ -64,4 +91,6 @@ class FrozenList(collections.Sequence):
         return len(self.__data)
 
     def __repr__(self):
-        return repr(self.__data)
\ No newline at end of file
+        return repr(self.__data)
+
+_FROZEN_TYPES = (FrozenDict, FrozenList)
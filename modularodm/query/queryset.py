@@ -1,20 +1,85 @@
 # -*- coding: utf-8 -*-
 
 import abc
+import itertools
+
 import six
 
+from modularodm.exceptions import QueryException
+
 
 @six.add_metaclass(abc.ABCMeta)
 class BaseQuerySet(object):
 
     _NEGATIVE_INDEXING = False
 
+    # Fields omitted from the records, which load on first access; see
+    # `StoredObject.find`
+    _deferred = frozenset()
+
+    # Foreign fields whose records are loaded in batches; see `prefetch`
+    _prefetched = ()
+
+    # Number of results whose references are prefetched together
+    PREFETCH_BATCH_SIZE = 100
+
     def __init__(self, schema, data=None):
 
         self.schema = schema
         self.primary = schema._primary_name
         self.data = data
 
+    def _load(self, data):
+        return self.schema.load(data=data, _deferred=self._deferred)
+
+    def _load_all(self, records):
+        """Load an iterable of records lazily. If fields are prefetched,
+        records are read in batches and the records they reference are
+        cached before any of the batch is loaded.
+        """
+        if not self._prefetched:
+            for record in records:
+                yield self._load(record)
+            return
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, self.PREFETCH_BATCH_SIZE))
+            if not batch:
+                return
+            self.schema._prefetch_references(batch, self._prefetched)
+            for record in batch:
+                yield self._load(record)
+
+    def _derive(self, data):
+        """Create a query set of the same type and options over other data.
+        """
+        query_set = self.__class__(self.schema, data)
+        query_set._deferred = self._deferred
+        query_set._prefetched = self._prefetched
+        return query_set
+
+    def prefetch(self, *fields):
+        """Load the records referenced by foreign fields with one batched
+        query per target schema, rather than one query per result, as
+        results are iterated.
+
+            Post.find(query).prefetch('author', 'tags')
+
+        :param fields: Names of foreign fields
+        :returns: The query set
+        """
+        for name in fields:
+            field_object = self.schema._fields.get(name)
+            if field_object is None or not field_object._is_foreign:
+                raise QueryException(
+                    'Cannot prefetch <{0}>; not a foreign field of '
+                    '<{1}>'.format(name, self.schema._name)
+                )
+        self._prefetched = tuple(self._prefetched) + tuple(
+            name for name in fields if name not in self._prefetched
+        )
+        return self
+
     def __getitem__(self, index):
         if isinstance(index, slice):
             if index.step:
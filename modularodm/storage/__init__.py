@@ -1,4 +1,13 @@
 from .base import Storage
 from .mongostorage import MongoStorage
 from .picklestorage import PickleStorage
+from .shardedpicklestorage import ShardedPickleStorage
+from .sqlitestorage import SQLiteStorage
+from .dbmstorage import DbmStorage
+from .snapshotstorage import SnapshotStorage
 from .ephemeralstorage import EphemeralStorage
+
+try:
+    from .asyncstorage import AsyncStorage, ExecutorStorage, AsyncMongoStorage
+except ImportError:  # asyncio requires Python 3.4
+    pass
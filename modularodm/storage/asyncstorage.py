@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Storage for asyncio applications. Methods return futures rather than
+blocking the event loop, so that one worker can keep many queries in
+flight. Requires Python 3.4.4 or later.
+"""
+
+import abc
+import asyncio
+import functools
+
+import six
+from pymongo.errors import DuplicateKeyError
+
+from .mongostorage import translate_query, _projection, _update_document
+from modularodm.exceptions import KeyExistsException
+
+
+def _new_future(loop):
+    try:
+        return loop.create_future()
+    except AttributeError:  # Python < 3.5.2
+        return asyncio.Future(loop=loop)
+
+
+def completed(value):
+    """Get a future that is already resolved to `value`."""
+    future = _new_future(asyncio.get_event_loop())
+    future.set_result(value)
+    return future
+
+
+def then(awaitable, callback):
+    """Get a future for the result of calling `callback` on the result of
+    `awaitable`. If `callback` returns a future or coroutine, the returned
+    future resolves to its result. Errors and cancellation are passed on.
+
+    :param awaitable: Future or coroutine
+    :param callback: Function taking the result of `awaitable`
+    :returns: Future
+
+    """
+    source = asyncio.ensure_future(awaitable)
+    result = _new_future(asyncio.get_event_loop())
+
+    def copy(future):
+        if result.cancelled():
+            return
+        if future.cancelled():
+            result.cancel()
+        elif future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            result.set_result(future.result())
+
+    def done(future):
+        if result.cancelled():
+            return
+        if future.cancelled():
+            result.cancel()
+            return
+        if future.exception() is not None:
+            result.set_exception(future.exception())
+            return
+        try:
+            value = callback(future.result())
+        except Exception as error:
+            result.set_exception(error)
+            return
+        if isinstance(value, asyncio.Future) or asyncio.iscoroutine(value):
+            asyncio.ensure_future(value).add_done_callback(copy)
+        else:
+            result.set_result(value)
+
+    source.add_done_callback(done)
+    return result
+
+
+@six.add_metaclass(abc.ABCMeta)
+class AsyncStorage(object):
+    """Abstract base class for asynchronous storage. Methods take the same
+    arguments as their counterparts on :class:`~.base.Storage` and return
+    futures.
+    """
+
+    @abc.abstractmethod
+    def aget(self, primary_name, key):
+        """Get a single record, or None if it does not exist."""
+        pass
+
+    @abc.abstractmethod
+    def afind(self, query=None, **kwargs):
+        """Get a list of the records matching a query. Takes the `offset`,
+        `limit`, and `defer` keyword arguments of `Storage.find`.
+        """
+        pass
+
+    @abc.abstractmethod
+    def ainsert(self, primary_name, key, value):
+        """Insert a new record."""
+        pass
+
+    @abc.abstractmethod
+    def aupdate(self, query, data, unset=None):
+        """Update records with new data."""
+        pass
+
+    @abc.abstractmethod
+    def aremove(self, query=None):
+        """Remove records."""
+        pass
+
+
+def _find_all(storage, query, kwargs):
+    return list(storage.find(query, **kwargs))
+
+
+class ExecutorStorage(AsyncStorage):
+    """Run the methods of a synchronous storage object in an executor. Used
+    for backends without a native asynchronous driver, such as
+    :class:`~.picklestorage.PickleStorage`, which guard their writes with a
+    lock.
+
+    :param Storage storage: Synchronous storage
+    :param executor: Optional :class:`concurrent.futures.Executor`; defaults
+        to the default executor of the event loop
+
+    """
+    def __init__(self, storage, executor=None):
+        self.storage = storage
+        self.executor = executor
+
+    def _run(self, func, *args, **kwargs):
+        return asyncio.get_event_loop().run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def aget(self, primary_name, key):
+        return self._run(self.storage.get, primary_name, key)
+
+    def afind(self, query=None, **kwargs):
+        return self._run(_find_all, self.storage, query, kwargs)
+
+    def ainsert(self, primary_name, key, value):
+        return self._run(self.storage.insert, primary_name, key, value)
+
+    def aupdate(self, query, data, unset=None):
+        kwargs = {'unset': unset} if unset else {}
+        return self._run(self.storage.update, query, data, **kwargs)
+
+    def aremove(self, query=None):
+        return self._run(self.storage.remove, query)
+
+
+class AsyncMongoStorage(AsyncStorage):
+    """Wrap a collection of an asyncio MongoDB driver with the interface of
+    pymongo's `Collection`, such as Motor's `AsyncIOMotorCollection`.
+
+    :param collection: Asynchronous collection
+
+    """
+    def __init__(self, collection):
+        self.store = collection
+
+    def aget(self, primary_name, key):
+        return asyncio.ensure_future(self.store.find_one({primary_name: key}))
+
+    def afind(self, query=None, **kwargs):
+        cursor = self.store.find(
+            translate_query(query), _projection(kwargs.get('defer'))
+        )
+        if kwargs.get('offset'):
+            cursor = cursor.skip(kwargs['offset'])
+        if kwargs.get('limit') is not None:
+            cursor = cursor.limit(kwargs['limit'])
+        return asyncio.ensure_future(cursor.to_list(None))
+
+    def ainsert(self, primary_name, key, value):
+        if primary_name not in value:
+            value = value.copy()
+            value[primary_name] = key
+        result = _new_future(asyncio.get_event_loop())
+
+        def done(future):
+            if future.cancelled():
+                result.cancel()
+            elif isinstance(future.exception(), DuplicateKeyError):
+                result.set_exception(KeyExistsException())
+            elif future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(None)
+
+        asyncio.ensure_future(self.store.insert_one(value)).add_done_callback(done)
+        return result
+
+    def aupdate(self, query, data, unset=None):
+        mongo_query = translate_query(query)
+        update_query = _update_document(mongo_query, data, unset)
+        if not update_query:
+            return completed(None)
+        return asyncio.ensure_future(
+            self.store.update_many(mongo_query, update_query)
+        )
+
+    def aremove(self, query=None):
+        return asyncio.ensure_future(
+            self.store.delete_many(translate_query(query))
+        )
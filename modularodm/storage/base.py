@@ -2,13 +2,68 @@ import abc
 import six
 import time
 import random
+import numbers
 import itertools
 from functools import wraps
 
 from ..translators import DefaultTranslator
+from ..query.query import RawQuery
+from modularodm.frozen import FrozenList
 from modularodm.exceptions import KeyExistsException
 
 
+def apply_operators(record, inc=None, push=None, add_to_set=None, pull=None):
+    """Compute the result of atomic update operators on a record, following
+    the semantics of the MongoDB operators of the same names. Missing
+    counters start at zero and missing lists start empty; as in MongoDB,
+    applying an operator to a null or mistyped value is an error.
+
+    :param record: Record to read current values from; not modified
+    :param dict inc: Amounts to add, keyed by field name
+    :param dict push: Values to append, keyed by field name
+    :param dict add_to_set: Values to append unless present, keyed by field
+        name
+    :param dict pull: Values whose occurrences to remove, keyed by field name
+    :returns: Dictionary of changed keys and their new values
+    :raises: TypeError if a value cannot take its operator
+
+    """
+    changes = {}
+
+    def current(key, operator, types, default):
+        if key in changes:
+            return changes[key]
+        if key not in record:
+            return default
+        value = record[key]
+        if not isinstance(value, types) or isinstance(value, bool):
+            raise TypeError(
+                'Cannot apply <{0}> to field <{1}> with value {2!r}'.format(
+                    operator, key, value
+                )
+            )
+        return value
+
+    def current_list(key, operator):
+        return list(current(key, operator, (list, tuple, FrozenList), []))
+
+    for key, amount in (inc or {}).items():
+        changes[key] = current(key, 'inc', numbers.Number, 0) + amount
+    for key, value in (push or {}).items():
+        changes[key] = current_list(key, 'push') + [value]
+    for key, value in (add_to_set or {}).items():
+        values = current_list(key, 'add_to_set')
+        if value not in values:
+            values.append(value)
+        changes[key] = values
+    for key, value in (pull or {}).items():
+        changes[key] = [
+            item for item in current_list(key, 'pull') if item != value
+        ]
+
+    return changes
+
+
 class Logger(object):
 
     def __init__(self):
@@ -177,14 +232,87 @@ class Storage(object):
         pass
 
     @abc.abstractmethod
-    def update(self, query, data):
+    def update(self, query, data, unset=None):
         """Update multiple records with new data.
 
         :param query: A query object.
         :param dict data: Dictionary of key:value pairs.
+        :param list unset: Keys to remove from the records
         """
         pass
 
+    def modify(self, query, inc=None, push=None, add_to_set=None, pull=None):
+        """Apply atomic update operators to the matching records; see
+        :func:`apply_operators`. Each record must be read and written without
+        other writers interleaving.
+
+        Optional: a generic read-modify-write would not be atomic, so there
+        is no default, and backends that cannot apply the operators
+        atomically raise `NotImplementedError`. All backends shipped here
+        implement it; `MongoStorage` reports values that cannot take their
+        operator with pymongo's `WriteError` rather than `TypeError`.
+
+        :param query: A query object.
+        :param dict inc: Amounts to add, keyed by field name
+        :param dict push: Values to append, keyed by field name
+        :param dict add_to_set: Values to append unless present, keyed by
+            field name
+        :param dict pull: Values to remove, keyed by field name
+        """
+        raise NotImplementedError(
+            '{0} does not support update operators'.format(
+                self.__class__.__name__
+            )
+        )
+
+    def insert_many(self, primary_name, records):
+        """Insert several new records. Backends that can write a batch more
+        cheaply than one record at a time should override this.
+
+        If any key is repeated or already exists, `KeyExistsException` is
+        raised and no record is inserted. Backends without transactions,
+        including this default, check the keys before writing, so a
+        concurrent insert of the same key can still leave part of the batch
+        written.
+
+        :param str primary_name: Name of primary key
+        :param list records: List of (primary key, record) pairs
+        """
+        self._check_new_keys(primary_name, [key for key, _ in records])
+        for key, value in records:
+            self.insert(primary_name, key, value)
+
+    def _check_new_keys(self, primary_name, keys):
+        """Raise `KeyExistsException` if any key is repeated or already
+        exists.
+
+        :param str primary_name: Name of primary key
+        :param list keys: Values of the primary key
+        """
+        seen = set()
+        for key in keys:
+            if key in seen:
+                raise KeyExistsException(
+                    'Key ({key}) already exists'.format(key=key)
+                )
+            seen.add(key)
+        existing = self.get_many(primary_name, keys)
+        if existing:
+            raise KeyExistsException(
+                'Key ({key}) already exists'.format(key=next(iter(existing)))
+            )
+
+    def update_many(self, primary_name, records):
+        """Update several records by primary key. Backends that can write a
+        batch more cheaply than one record at a time should override this.
+
+        :param str primary_name: Name of primary key
+        :param list records: List of (primary key, data) pairs, where data
+            is a dictionary of key:value pairs
+        """
+        for key, data in records:
+            self.update(RawQuery(primary_name, 'eq', key), data)
+
     @abc.abstractmethod
     def get(self, primary_name, key):
         """Get a single record.
@@ -194,6 +322,22 @@ class Storage(object):
         """
         pass
 
+    def get_many(self, primary_name, keys):
+        """Get several records. Backends that can fetch a batch more cheaply
+        than one record at a time should override this.
+
+        :param str primary_name: The name of the primary key.
+        :param keys: Values of the primary key
+        :returns: Dictionary mapping the keys of the records found to the
+            records
+        """
+        records = {}
+        for key in keys:
+            record = self.get(primary_name, key)
+            if record is not None:
+                records[key] = record
+        return records
+
     @abc.abstractmethod
     def remove(self, query=None):
         """Remove records.
@@ -223,7 +367,10 @@ class Storage(object):
         """
         Return a generator of query results. Takes optional `by_pk` keyword
         argument; if true, return keys rather than
-        values.
+        values. Optional `offset` and `limit` keyword arguments skip and cap
+        the results, so that backends can stop scanning early. An optional
+        `defer` keyword argument lists keys that backends may leave out of
+        the returned records.
 
         :param query:
 
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import threading
+
+try:
+    import anydbm as dbm
+except ImportError:
+    import dbm
+
+from .base import Storage, apply_operators
+from .picklestorage import PickleQuerySet, compile_query
+from modularodm.exceptions import (
+    KeyExistsException,
+    MultipleResultsFound,
+    NoResultsFound,
+)
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class DbmStorage(Storage):
+    """Storage backend keeping one pickled record per key in a :mod:`dbm`
+    database. Opening a collection does not read any records, `get` reads
+    only the requested record, and `find` streams over keys rather than
+    holding the collection in memory.
+    """
+
+    QuerySet = PickleQuerySet
+
+    def __init__(self, collection_name, prefix='db_', ext='dbm'):
+        """Build database file name and open the database, creating it if it
+        does not exist.
+
+        :param collection_name: Collection name
+        :param prefix: File prefix.
+        :param ext: File extension. Some dbm implementations add their own
+            extensions to this name.
+
+        """
+        filename = collection_name + '.' + ext
+        if prefix:
+            self.filename = prefix + filename
+        else:
+            self.filename = filename
+
+        self._lock = threading.RLock()
+        self.store = dbm.open(self.filename, 'c')
+
+    @staticmethod
+    def _dump_key(key):
+        return pickle.dumps(key, 2)
+
+    def _read(self, raw_key):
+        try:
+            data = self.store[raw_key]
+        except KeyError:
+            return None
+        return pickle.loads(data)
+
+    def _write(self, raw_key, value):
+        self.store[raw_key] = pickle.dumps(value, 2)
+
+    def _iter_keys(self):
+        # Take a snapshot so that callers may write while iterating
+        return list(self.store.keys())
+
+    def insert(self, primary_name, key, value):
+        raw_key = self._dump_key(key)
+        with self._lock:
+            if raw_key in self.store:
+                raise KeyExistsException(
+                    'Key {0} already exists'.format(key)
+                )
+            self._write(raw_key, value)
+
+    def update(self, query, data, unset=None):
+        with self._lock:
+            for raw_key in list(self._find(query, raw_keys=True)):
+                value = self._read(raw_key)
+                if value is None:
+                    continue
+                value.update(data)
+                for key in unset or ():
+                    value.pop(key, None)
+                self._write(raw_key, value)
+
+    def modify(self, query, inc=None, push=None, add_to_set=None, pull=None):
+        with self._lock:
+            for raw_key in list(self._find(query, raw_keys=True)):
+                value = self._read(raw_key)
+                if value is None:
+                    continue
+                value.update(
+                    apply_operators(value, inc, push, add_to_set, pull)
+                )
+                self._write(raw_key, value)
+
+    def get(self, primary_name, key):
+        return self._read(self._dump_key(key))
+
+    def remove(self, query=None):
+        with self._lock:
+            for raw_key in list(self._find(query, raw_keys=True)):
+                try:
+                    del self.store[raw_key]
+                except KeyError:
+                    pass
+
+    def flush(self):
+        sync = getattr(self.store, 'sync', None)
+        if sync is not None:
+            with self._lock:
+                sync()
+
+    def close(self):
+        """Close the underlying database."""
+        with self._lock:
+            self.store.close()
+
+    def find_one(self, query=None, **kwargs):
+        results = list(self.find(query, limit=2))
+        if len(results) == 1:
+            return results[0]
+        elif len(results) == 0:
+            raise NoResultsFound()
+        else:
+            raise MultipleResultsFound(
+                'Query for find_one must return exactly one result; '
+                'returned {0}'.format(len(results))
+            )
+
+    def find(self, query=None, **kwargs):
+        offset = kwargs.get('offset') or 0
+        limit = kwargs.get('limit')
+        results = self._find(query, by_pk=kwargs.get('by_pk'))
+        if offset or limit is not None:
+            stop = None if limit is None else offset + limit
+            results = itertools.islice(results, offset, stop)
+        return results
+
+    def _find(self, query, by_pk=False, raw_keys=False):
+        match = compile_query(query) if query is not None else None
+        for raw_key in self._iter_keys():
+            if match is None and raw_keys:
+                yield raw_key
+                continue
+            value = self._read(raw_key)
+            if value is None or (match is not None and not match(value)):
+                continue
+            if raw_keys:
+                yield raw_key
+            elif by_pk:
+                yield pickle.loads(raw_key)
+            else:
+                yield value
@@ -10,8 +10,8 @@ except ImportError:
 
 class EphemeralStorage(PickleStorage):
     def __init__(self, *args, **kwargs):
-        self.store = {}
+        self._init_state()
         self.fp = BytesIO()
 
-    def flush(self):
+    def _flush(self):
         pickle.dump(self.store, self.fp, -1)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+
+import six
+
+from modularodm.frozen import FrozenList
+
+
+class HashIndex(object):
+    """In-memory index mapping the values of a single field to the primary
+    keys of the records holding them. Records whose value is a list are
+    indexed under each element, matching the semantics of the ``eq``
+    operator on list fields.
+
+    If a value cannot be hashed, the index marks itself invalid and callers
+    must fall back to scanning.
+
+    :param str field_name: Name of the indexed field
+
+    """
+    def __init__(self, field_name):
+        self.field_name = field_name
+        self.entries = {}
+        self.size = 0
+        self.valid = True
+
+    def _values(self, record):
+        try:
+            value = record[self.field_name]
+        except KeyError:
+            return []
+        if isinstance(value, (list, FrozenList)):
+            return value
+        return [value]
+
+    def build(self, store):
+        """Index every record in a store.
+
+        :param dict store: Mapping of primary keys to records
+
+        """
+        for key, record in six.iteritems(store):
+            self.add(key, record)
+
+    def add(self, key, record):
+        if not self.valid:
+            return
+        try:
+            for value in self._values(record):
+                keys = self.entries.setdefault(value, set())
+                if key not in keys:
+                    keys.add(key)
+                    self.size += 1
+        except TypeError:
+            self.valid = False
+            self.entries = {}
+            self.size = 0
+
+    def discard(self, key, record):
+        if not self.valid or record is None:
+            return
+        for value in self._values(record):
+            keys = self.entries.get(value)
+            if keys is None or key not in keys:
+                continue
+            keys.remove(key)
+            self.size -= 1
+            if not keys:
+                del self.entries[value]
+
+    def count(self, values):
+        """Count the records matching any of `values`, without building the
+        set of their keys. Records holding more than one of `values` in a
+        list are counted more than once.
+
+        :returns: Number of records, or None if the index cannot answer
+
+        """
+        if not self.valid:
+            return None
+        try:
+            return sum(len(self.entries.get(value, ())) for value in values)
+        except TypeError:
+            return None
+
+    def lookup(self, values):
+        """Get the primary keys of records matching any of `values`.
+
+        :param values: Iterable of values
+        :returns: Set of primary keys, or None if the index cannot answer
+
+        """
+        if not self.valid:
+            return None
+        keys = set()
+        try:
+            for value in values:
+                keys.update(self.entries.get(value, ()))
+        except TypeError:
+            return None
+        return keys
+
+
+class OrderedIndex(HashIndex):
+    """Hash index that also keeps its distinct values in sorted order, so
+    that range predicates and sorts can be answered by bisection rather than
+    by scanning.
+
+    Ordering is only maintained while every indexed value is a scalar that
+    can be compared with the others; otherwise the index sets `ordered` to
+    False and continues to serve equality lookups.
+
+    :param str field_name: Name of the indexed field
+
+    """
+    def __init__(self, field_name):
+        super(OrderedIndex, self).__init__(field_name)
+        self.keys = []
+        self.ordered = True
+
+    def _unorder(self):
+        self.ordered = False
+        self.keys = []
+
+    def add(self, key, record):
+        if not self.valid:
+            return
+        try:
+            value = record[self.field_name]
+        except KeyError:
+            return
+        if self.ordered:
+            if isinstance(value, (list, FrozenList)):
+                self._unorder()
+            else:
+                try:
+                    if value not in self.entries:
+                        bisect.insort(self.keys, value)
+                except TypeError:
+                    self._unorder()
+        super(OrderedIndex, self).add(key, record)
+        if not self.valid:
+            self._unorder()
+
+    def discard(self, key, record):
+        if not self.valid or record is None:
+            return
+        super(OrderedIndex, self).discard(key, record)
+        if not self.ordered:
+            return
+        if self.field_name not in record:
+            return
+        value = record[self.field_name]
+        if value in self.entries:
+            return
+        position = bisect.bisect_left(self.keys, value)
+        if position < len(self.keys) and self.keys[position] == value:
+            del self.keys[position]
+
+    def _bounds(self, keys, operator, argument):
+        """Get the slice of `keys` satisfying a range predicate.
+
+        :param list keys: Snapshot of `self.keys`
+        :returns: Tuple of (start, stop), or None if the index cannot answer
+
+        """
+        try:
+            if operator == 'gt':
+                return bisect.bisect_right(keys, argument), len(keys)
+            if operator == 'gte':
+                return bisect.bisect_left(keys, argument), len(keys)
+            if operator == 'lt':
+                return 0, bisect.bisect_left(keys, argument)
+            if operator == 'lte':
+                return 0, bisect.bisect_right(keys, argument)
+        except TypeError:
+            return None
+        return None
+
+    def _snapshot(self):
+        """Copy the sorted values, or get None if the index is not ordered.
+        Readers do not take the storage lock, so they work on a copy rather
+        than on a list that writers may change meanwhile.
+        """
+        if not self.valid or not self.ordered:
+            return None
+        return list(self.keys)
+
+    def count_range(self, operator, argument):
+        """Estimate the number of records satisfying a range predicate from
+        the number of distinct values in range.
+
+        :returns: Estimated number of records, or None if the index cannot
+            answer
+
+        """
+        keys = self._snapshot()
+        if keys is None:
+            return None
+        bounds = self._bounds(keys, operator, argument)
+        if bounds is None:
+            return None
+        if not keys:
+            return 0
+        return (bounds[1] - bounds[0]) * self.size // len(keys)
+
+    def range(self, operator, argument):
+        """Get the primary keys of records satisfying a range predicate.
+
+        :param str operator: One of ``gt``, ``gte``, ``lt``, or ``lte``
+        :param argument: Value to compare against
+        :returns: Set of primary keys, or None if the index cannot answer
+
+        """
+        keys = self._snapshot()
+        if keys is None:
+            return None
+        bounds = self._bounds(keys, operator, argument)
+        if bounds is None:
+            return None
+        pks = set()
+        for value in keys[bounds[0]:bounds[1]]:
+            # Entries removed since the snapshot hold no records
+            pks.update(self.entries.get(value, ()))
+        return pks
+
+    def iter_entries(self, reverse=False):
+        """Iterate over (value, primary keys) pairs in sort order. Values and
+        key sets are copied, so writers may change the index meanwhile.
+
+        :param bool reverse: Iterate in descending order
+
+        """
+        keys = self._snapshot() or []
+        values = reversed(keys) if reverse else keys
+        for value in values:
+            yield value, set(self.entries.get(value, ()))
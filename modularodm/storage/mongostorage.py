@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*_
 
 import re
+import threading
+import collections
+
 import pymongo
 
 from .base import Storage
@@ -14,6 +17,10 @@ from modularodm.exceptions import (
 )
 
 
+# Server error codes for duplicate key violations
+DUPLICATE_KEY_ERRORS = (11000, 11001)
+
+
 # From mongoengine.queryset.transform
 COMPARISON_OPERATORS = ('ne', 'gt', 'gte', 'lt', 'lte', 'in', 'nin', 'mod',
                         'all', 'size', 'exists', 'not', 'elemMatch')
@@ -34,80 +41,212 @@ STRING_OPERATORS     = ('contains', 'icontains', 'startswith',
 #                         'set_on_insert')
 
 
+class LRUCache(object):
+    """Mapping holding at most `size` entries, evicting the least recently
+    used entry when full.
+
+    :param int size: Maximum number of entries
+
+    """
+    def __init__(self, size):
+        self.size = size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, factory):
+        """Get the entry for `key`, creating it with `factory(key)` if it is
+        missing.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                pass
+            else:
+                self._data[key] = value
+                return value
+        value = factory(key)
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Compiled regular expressions, keyed on (operator, argument)
+REGEX_CACHE = LRUCache(1024)
+
+# Query templates, keyed on query shape
+TEMPLATE_CACHE = LRUCache(1024)
+
+
+def _compile_regex(key):
+    op, value = key
+
+    flags = 0
+    if op.startswith('i'):
+        flags = re.IGNORECASE
+        op = op.lstrip('i')
+
+    regex = r'%s'
+    if op == 'startswith':
+        regex = r'^%s'
+    elif op == 'endswith':
+        regex = r'%s$'
+    elif op == 'exact':
+        regex = r'^%s$'
+
+    # escape unsafe characters which could lead to a re.error
+    value = re.escape(value)
+    return re.compile(regex % value, flags)
+
+
 # Adapted from mongoengine.fields
 def prepare_query_value(op, value):
 
     if op.lstrip('i') in ('startswith', 'endswith', 'contains', 'exact'):
-        flags = 0
-        if op.startswith('i'):
-            flags = re.IGNORECASE
-            op = op.lstrip('i')
-
-        regex = r'%s'
-        if op == 'startswith':
-            regex = r'^%s'
-        elif op == 'endswith':
-            regex = r'%s$'
-        elif op == 'exact':
-            regex = r'^%s$'
-
-        # escape unsafe characters which could lead to a re.error
-        value = re.escape(value)
-        value = re.compile(regex % value, flags)
+        try:
+            value = REGEX_CACHE.get((op, value), _compile_regex)
+        except TypeError:
+            value = _compile_regex((op, value))
 
     return value
 
 
-# TODO: Test me
-def translate_query(query=None, mongo_query=None):
-    """
+def query_shape(query, arguments):
+    """Get the shape of a query: its tree of attributes and operators,
+    without arguments. Queries of the same shape translate to the same
+    MongoDB filter up to their arguments.
 
-    """
-    mongo_query = mongo_query or {}
+    :param query: Query object, or None
+    :param list arguments: List to append the arguments of the query to, in
+        tree order
+    :returns: Hashable shape
 
+    """
     if isinstance(query, RawQuery):
-        attribute, operator, argument = \
-            query.attribute, query.operator, query.argument
+        arguments.append(query.argument)
+        return (query.attribute, query.operator)
+    elif isinstance(query, QueryGroup):
+        return (query.operator, tuple(
+            query_shape(node, arguments) for node in query.nodes
+        ))
+    elif query is None:
+        return None
+    raise TypeError('Query must be a QueryGroup or Query object.')
 
-        if operator == 'eq':
-            mongo_query[attribute] = argument
 
-        elif operator in COMPARISON_OPERATORS:
-            mongo_operator = '$' + operator
-            if attribute not in mongo_query:
-                mongo_query[attribute] = {}
-            mongo_query[attribute][mongo_operator] = argument
+def _compile_template(shape):
+    """Compile a query shape into a function that builds the MongoDB filter
+    from an iterator over the arguments of the query.
+    """
+    if shape is None:
+        return lambda arguments: {}
+
+    if isinstance(shape[1], tuple):
+        operator, nodes = shape
+        nodes = [_compile_template(node) for node in nodes]
+        if operator == 'and':
+            return lambda arguments: {
+                '$and': [node(arguments) for node in nodes]
+            }
+        elif operator == 'or':
+            return lambda arguments: {
+                '$or': [node(arguments) for node in nodes]
+            }
+        elif operator == 'not':
+            # Hack: A nor A == not A
+            def template(arguments):
+                subquery = [node(arguments) for node in nodes][0]
+                return {'$nor': [subquery, subquery]}
+            return template
+        raise ValueError('QueryGroup operator must be <and>, <or>, or <not>.')
+
+    attribute, operator = shape
+
+    if operator == 'eq':
+        return lambda arguments: {attribute: next(arguments)}
+
+    elif operator in COMPARISON_OPERATORS:
+        mongo_operator = '$' + operator
+        return lambda arguments: {
+            attribute: {mongo_operator: next(arguments)}
+        }
+
+    elif operator in STRING_OPERATORS:
+        return lambda arguments: {
+            attribute: {
+                '$regex': prepare_query_value(operator, next(arguments))
+            }
+        }
+
+    def template(arguments):
+        next(arguments)
+        return {}
+    return template
 
-        elif operator in STRING_OPERATORS:
-            mongo_operator = '$regex'
-            mongo_regex = prepare_query_value(operator, argument)
-            if attribute not in mongo_query:
-                mongo_query[attribute] = {}
-            mongo_query[attribute][mongo_operator] = mongo_regex
 
-    elif isinstance(query, QueryGroup):
+def translate_query(query=None, mongo_query=None):
+    """Translate a query to a MongoDB filter. Filters are built from
+    templates cached on the shape of the query, so that repeated queries
+    only bind their arguments.
 
-        if query.operator == 'and':
-            return {'$and': [translate_query(node) for node in query.nodes]}
+    :param query: Query object, or None
+    :param dict mongo_query: Optional filter to add a single query to
+    :returns: MongoDB filter
 
-        elif query.operator == 'or':
-            return {'$or' : [translate_query(node) for node in query.nodes]}
+    """
+    if mongo_query:
+        for attribute, value in translate_query(query).items():
+            if isinstance(value, dict) and \
+                    isinstance(mongo_query.get(attribute), dict):
+                mongo_query[attribute].update(value)
+            else:
+                mongo_query[attribute] = value
+        return mongo_query
 
-        elif query.operator == 'not':
-            # Hack: A nor A == not A
-            subquery = translate_query(query.nodes[0])
-            return {'$nor' : [subquery, subquery]}
+    arguments = []
+    shape = query_shape(query, arguments)
+    template = TEMPLATE_CACHE.get(shape, _compile_template)
+    return template(iter(arguments))
 
-        else:
-            raise ValueError('QueryGroup operator must be <and>, <or>, or <not>.')
 
-    elif query is None:
-        return {}
+def _projection(defer):
+    """Build a projection excluding deferred fields, or None to fetch whole
+    documents.
+    """
+    if not defer:
+        return None
+    return dict((key, False) for key in defer)
 
+
+def _update_document(mongo_query, data, unset=None):
+    """Build the update document setting `data` and removing `unset`, or
+    None if there is nothing to change.
+    """
+    # Field "_id" shouldn't appear in both search and update queries; else
+    # MongoDB will raise a "Mod on _id not allowed" error
+    if '_id' in mongo_query:
+        update_data = {k: v for k, v in data.items() if k != '_id'}
     else:
-        raise TypeError('Query must be a QueryGroup or Query object.')
+        update_data = data
 
-    return mongo_query
+    # MongoDB rejects empty update operators
+    update_query = {}
+    if update_data:
+        update_query['$set'] = update_data
+    # Field "_id" is immutable, so it can't be removed either
+    unset = [key for key in unset or () if key != '_id']
+    if unset:
+        update_query['$unset'] = dict((key, '') for key in unset)
+    return update_query or None
 
 
 class MongoQuerySet(BaseQuerySet):
@@ -121,7 +260,7 @@ class MongoQuerySet(BaseQuerySet):
 
     def _do_getitem(self, index, raw=False):
         if isinstance(index, slice):
-            return MongoQuerySet(self.schema, self.data.clone()[index])
+            return self._derive(self.data.clone()[index])
         if index < 0:
             clone = self.data.clone().sort([(o[0], o[1] * -1) for o in self._order])
             result = clone[(index * -1) - 1]
@@ -129,13 +268,13 @@ class MongoQuerySet(BaseQuerySet):
             result = self.data[index]
         if raw:
             return result[self.primary]
-        return self.schema.load(data=result)
+        return self._load(result)
 
     def __iter__(self, raw=False):
         cursor = self.data.clone()
         if raw:
             return [each[self.primary] for each in cursor]
-        return (self.schema.load(data=each) for each in cursor)
+        return self._load_all(cursor)
 
     def __len__(self):
         return self.data.count(with_limit_and_skip=True)
@@ -196,11 +335,18 @@ class MongoStorage(Storage):
 
     def find(self, query=None, **kwargs):
         mongo_query = translate_query(query)
-        return self.store.find(mongo_query)
+        cursor = self.store.find(mongo_query, _projection(kwargs.get('defer')))
+        if kwargs.get('offset'):
+            cursor = cursor.skip(kwargs['offset'])
+        if kwargs.get('limit') is not None:
+            cursor = cursor.limit(kwargs['limit'])
+        return cursor
 
     def find_one(self, query=None, **kwargs):
         mongo_query = translate_query(query)
-        matches = self.store.find(mongo_query).limit(2)
+        matches = self.store.find(
+            mongo_query, _projection(kwargs.get('defer'))
+        ).limit(2)
 
         if matches.count() == 1:
             return matches[0]
@@ -216,6 +362,15 @@ class MongoStorage(Storage):
     def get(self, primary_name, key):
         return self.store.find_one({primary_name : key})
 
+    def get_many(self, primary_name, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        return dict(
+            (record[primary_name], record)
+            for record in self.store.find({primary_name: {'$in': keys}})
+        )
+
     def insert(self, primary_name, key, value):
         if primary_name not in value:
             value = value.copy()
@@ -225,16 +380,47 @@ class MongoStorage(Storage):
         except pymongo.errors.DuplicateKeyError:
             raise KeyExistsException
 
-    def update(self, query, data):
+    def insert_many(self, primary_name, records):
+        if not records:
+            return
+        # The insert is ordered, so a duplicate key leaves the documents
+        # before it written; check first so that the batch usually fails as
+        # a whole. See `Storage.insert_many`.
+        self._check_new_keys(primary_name, [key for key, _ in records])
+        documents = []
+        for key, value in records:
+            if primary_name not in value:
+                value = value.copy()
+                value[primary_name] = key
+            documents.append(value)
+        try:
+            self.store.insert_many(documents)
+        except pymongo.errors.BulkWriteError as error:
+            if any(each.get('code') in DUPLICATE_KEY_ERRORS
+                   for each in error.details.get('writeErrors', [])):
+                raise KeyExistsException
+            raise
+
+    def update_many(self, primary_name, records):
+        requests = []
+        for key, data in records:
+            # See `update` on why "_id" is excluded
+            update_data = dict(
+                (field, value) for field, value in data.items()
+                if field != '_id'
+            )
+            if update_data:
+                requests.append(
+                    pymongo.UpdateOne({primary_name: key}, {'$set': update_data})
+                )
+        if requests:
+            self.store.bulk_write(requests)
+
+    def update(self, query, data, unset=None):
         mongo_query = translate_query(query)
-
-        # Field "_id" shouldn't appear in both search and update queries; else
-        # MongoDB will raise a "Mod on _id not allowed" error
-        if '_id' in mongo_query:
-            update_data = {k: v for k, v in data.items() if k != '_id'}
-        else:
-            update_data = data
-        update_query = {'$set': update_data}
+        update_query = _update_document(mongo_query, data, unset)
+        if not update_query:
+            return
 
         self.store.update(
             mongo_query,
@@ -243,6 +429,24 @@ class MongoStorage(Storage):
             multi=True,
         )
 
+    def modify(self, query, inc=None, push=None, add_to_set=None, pull=None):
+        update_query = {}
+        for operator, values in (
+                ('$inc', inc),
+                ('$push', push),
+                ('$addToSet', add_to_set),
+                ('$pull', pull)):
+            if values:
+                update_query[operator] = values
+        if not update_query:
+            return
+        self.store.update(
+            translate_query(query),
+            update_query,
+            upsert=False,
+            multi=True,
+        )
+
     def remove(self, query=None):
         mongo_query = translate_query(query)
         self.store.remove(mongo_query)
@@ -1,16 +1,27 @@
 # -*- coding utf-8 -*-
 
 import os
-import copy
+import math
+import tempfile
+import time
+import heapq
+import shutil
+import itertools
+import atexit
+import logging
+import weakref
+import threading
 
 import six
 
-from .base import Storage
+from .base import Storage, apply_operators
+from .indexes import OrderedIndex
 from ..query.queryset import BaseQuerySet
 from ..query.query import QueryGroup
 from ..query.query import RawQuery
 
 from modularodm.utils import DirtyField
+from modularodm.frozen import FrozenDict, FrozenList, freeze, thaw
 from modularodm.exceptions import (
     KeyExistsException,
     MultipleResultsFound,
@@ -23,8 +34,92 @@ except ImportError:
     import pickle
 
 
+logger = logging.getLogger(__name__)
+
+
+def _replace(src, dst):
+    """Atomically rename `src` to `dst`, overwriting `dst` if present.
+    """
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2: `rename` overwrites atomically on POSIX
+        os.rename(src, dst)
+
+
+def _append_file(src, dst):
+    """Append the contents of `src` to `dst`.
+    """
+    with open(src, 'rb') as src_fp:
+        with open(dst, 'ab') as dst_fp:
+            shutil.copyfileobj(src_fp, dst_fp)
+            dst_fp.flush()
+            os.fsync(dst_fp.fileno())
+
+
+def _flush_periodically(ref, interval):
+    """Flush a storage object's pending writes every `interval` seconds until
+    the object is garbage-collected.
+
+    :param ref: Weak reference to a :class:`PickleStorage`
+    :param float interval: Seconds between flushes
+
+    """
+    while True:
+        time.sleep(interval)
+        storage = ref()
+        if storage is None:
+            return
+        storage._flush_if_dirty()
+        del storage
+
+
+def _flush_at_exit(ref):
+    storage = ref()
+    if storage is not None:
+        storage._flush_if_dirty()
+
+
+def _read_records(filename):
+    """Load a pickled dict of records, freezing each record.
+    """
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    return dict(
+        (key, freeze(value))
+        for key, value in six.iteritems(pickle.loads(data))
+    )
+
+
+def _write_records(records, filename):
+    """Atomically replace a file with a pickled dict of records. Each call
+    writes to its own temporary file, so concurrent writers cannot clobber
+    each other's output. Records are thawed, so that the file holds only
+    builtin types.
+    """
+    records = dict(
+        (key, thaw(value)) for key, value in six.iteritems(records)
+    )
+    directory, basename = os.path.split(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(
+        prefix=basename + '.', suffix='.tmp', dir=directory
+    )
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(records, fp, -1)
+            fp.flush()
+            os.fsync(fp.fileno())
+        _replace(tmp_filename, filename)
+    except:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
 def _eq(data, test):
-    if isinstance(data, list):
+    if isinstance(data, (list, FrozenList)):
         return test in data
     return data == test
 
@@ -48,6 +143,80 @@ operators = {
 }
 
 
+def compile_query(query):
+    """Compile a query tree into a predicate on records. Operator functions
+    and arguments are bound once rather than dispatched per record, and
+    ``and``/``or``/``not`` groups stop evaluating as soon as their result is
+    known.
+
+    :param query: Query object
+    :returns: Function taking a record and returning whether it matches
+
+    """
+    if isinstance(query, QueryGroup):
+
+        predicates = [compile_query(node) for node in query.nodes]
+
+        if query.operator == 'and':
+            if len(predicates) == 1:
+                return predicates[0]
+            def predicate(record):
+                for each in predicates:
+                    if not each(record):
+                        return False
+                return True
+        elif query.operator == 'or':
+            if len(predicates) == 1:
+                return predicates[0]
+            def predicate(record):
+                for each in predicates:
+                    if each(record):
+                        return True
+                return False
+        elif query.operator == 'not':
+            def predicate(record):
+                for each in predicates:
+                    if each(record):
+                        return False
+                return True
+        else:
+            raise ValueError('QueryGroup operator must be <and>, <or>, or <not>.')
+
+        return predicate
+
+    elif isinstance(query, RawQuery):
+        attribute, operator, argument = \
+            query.attribute, query.operator, query.argument
+
+        func = operators[operator]
+        return lambda record: func(record[attribute], argument)
+
+    else:
+        raise TypeError('Query must be a QueryGroup or Query object.')
+
+
+class _Descending(object):
+    """Wrapper inverting the order of a value, so that keys sorted in
+    opposite directions can be combined into one composite sort key.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+
 class PickleQuerySet(BaseQuerySet):
 
     _sort = DirtyField(None)
@@ -58,32 +227,46 @@ class PickleQuerySet(BaseQuerySet):
 
         super(PickleQuerySet, self).__init__(schema)
 
-        self._data = list(data)
+        # Records are pulled from `data` only as they are needed and kept in
+        # `_data`, so the query set can be iterated more than once
+        self._source = iter(data)
+        self._data = []
         self._dirty = True
 
         self.data = []
 
-    def _eval(self):
-
-        if self._dirty:
+    def _fetch(self, count=None):
+        """Pull records from the source until `count` have been fetched, or
+        until the source is exhausted if `count` is None.
 
-            self.data = self._data[:]
+        :returns: Whether at least `count` records are available
 
-            if self._sort is not None:
+        """
+        if self._source is None:
+            return count is not None and len(self._data) >= count
+        if count is None:
+            self._data.extend(self._source)
+            self._source = None
+            return False
+        needed = count - len(self._data)
+        if needed > 0:
+            self._data.extend(itertools.islice(self._source, needed))
+            if len(self._data) < count:
+                self._source = None
+                return False
+        return True
 
-                for key in self._sort[::-1]:
+    def _eval(self):
+        """Sort and slice the full result set. Only needed when sorting;
+        otherwise records are streamed by `_iter_records`.
+        """
+        if self._dirty:
 
-                    if key.startswith('-'):
-                        reverse = True
-                        key = key.lstrip('-')
-                    else:
-                        reverse = False
+            self._fetch()
+            self.data = self._data
 
-                    self.data = sorted(
-                        self.data,
-                        key=lambda record: record[key],
-                        reverse=reverse
-                    )
+            if self._sort is not None:
+                self.data = self._sorted(self.data)
 
             if self._offset is not None:
                 self.data = self.data[self._offset:]
@@ -95,25 +278,125 @@ class PickleQuerySet(BaseQuerySet):
 
         return self
 
+    def _iter_records(self):
+        """Iterate over records, honoring sort, offset, and limit. Without a
+        sort, records are fetched from the source one at a time.
+        """
+        if self._sort is not None:
+            self._eval()
+            for record in self.data:
+                yield record
+            return
+
+        position = self._offset or 0
+        stop = None if self._limit is None else position + self._limit
+        while stop is None or position < stop:
+            if position >= len(self._data) and not self._fetch(position + 1):
+                break
+            yield self._data[position]
+            position += 1
+
+    def _sorted(self, records):
+        """Sort records on all sort keys at once. If a limit is set, only the
+        first `offset + limit` records are needed, so a heap-based partial
+        sort is used instead of sorting everything.
+        """
+        keys = [(key.lstrip('-'), key.startswith('-')) for key in self._sort]
+
+        top = None
+        if self._limit is not None:
+            top = self._limit + (self._offset or 0)
+            if top >= len(records):
+                top = None
+
+        if len(keys) == 1:
+            key, reverse = keys[0]
+            if top is None:
+                ordered = self._sort_by_index(records, key, reverse)
+                if ordered is not None:
+                    return ordered
+            sort_key = lambda record: record[key]
+            if top is not None:
+                select = heapq.nlargest if reverse else heapq.nsmallest
+                return select(top, records, key=sort_key)
+            return sorted(records, key=sort_key, reverse=reverse)
+
+        sort_key = lambda record: tuple(
+            _Descending(record[key]) if reverse else record[key]
+            for key, reverse in keys
+        )
+        if top is not None:
+            return heapq.nsmallest(top, records, key=sort_key)
+        return sorted(records, key=sort_key)
+
+    def _sort_by_index(self, records, key, reverse=False):
+        """Order records by walking an ordered index on `key`, which avoids a
+        full sort when the result set is large relative to the index. Ties
+        keep their original order, as with `sorted`.
+
+        :returns: Sorted list of records, or None if no usable index exists
+
+        """
+        get_index = getattr(self.schema._storage[0], '_get_index', None)
+        if get_index is None or not records:
+            return None
+        index = get_index(key)
+        if index is None or not index.valid or not index.ordered:
+            return None
+        if len(index.keys) > len(records) * max(1, math.log(len(records), 2)):
+            return None
+
+        positions = dict(
+            (record[self.primary], position)
+            for position, record in enumerate(records)
+        )
+        ordered = []
+        for value, keys in index.iter_entries(reverse=reverse):
+            hits = sorted(positions[pk] for pk in keys if pk in positions)
+            for position in hits:
+                record = records[position]
+                # Records fetched before a concurrent write may be stale
+                if record.get(key) != value:
+                    return None
+                ordered.append(record)
+
+        # Records missing the key are not indexed
+        if len(ordered) != len(records):
+            return None
+
+        return ordered
+
     def _do_getitem(self, index, raw=False):
-        self._eval()
         if isinstance(index, slice):
-            return PickleQuerySet(self.schema, self.data[index])
-        key = self.data[index][self.primary]
-        result = self.data[index]
+            return self._derive(
+                itertools.islice(self._iter_records(), index.start, index.stop)
+            )
+        try:
+            result = next(itertools.islice(self._iter_records(), index, None))
+        except StopIteration:
+            raise IndexError('list index out of range')
         if raw:
             return result[self.primary]
-        return self.schema.load(data=result)
+        return self._load(result)
 
     def __iter__(self, raw=False):
-        self._eval()
         if raw:
-            return [each[self.primary] for each in self.data]
-        return (self.schema.load(data=each) for each in self.data)
+            return [each[self.primary] for each in self._iter_records()]
+        return self._load_all(self._iter_records())
 
     def __len__(self):
-        self._eval()
-        return len(self.data)
+        if self._sort is not None:
+            self._eval()
+            return len(self.data)
+        start = self._offset or 0
+        if self._limit is None:
+            self._fetch()
+        else:
+            self._fetch(start + self._limit)
+        length = max(len(self._data) - start, 0)
+        if self._limit is not None:
+            length = min(length, self._limit)
+        return length
 
     count = __len__
 
@@ -138,16 +421,34 @@ class PickleQuerySet(BaseQuerySet):
 
 
 class PickleStorage(Storage):
-    """ Storage backend using pickle. """
+    """ Storage backend using pickle. Records are held as frozen structures
+    (see :mod:`modularodm.frozen`) so that reads can share them instead of
+    copying; writes replace whole records rather than mutating them.
+    """
 
     QuerySet = PickleQuerySet
 
-    def __init__(self, collection_name,  prefix='db_', ext='pkl'):
+    def __init__(self, collection_name,  prefix='db_', ext='pkl',
+                 journal=False, compact_threshold=None, compact_ratio=None,
+                 flush_every=1, flush_interval=None):
         """Build pickle file name and load data if exists.
 
         :param collection_name: Collection name
         :param prefix: File prefix.
         :param ext: File extension.
+        :param bool journal: Append each write to a journal file rather than
+            rewriting the whole collection on every flush. An existing
+            journal is replayed into a fresh snapshot on startup, whether or
+            not journaling is enabled.
+        :param int compact_threshold: Compact in a background thread once the
+            journal grows past this many bytes
+        :param float compact_ratio: Compact in a background thread once the
+            journal grows past this multiple of the snapshot size
+        :param int flush_every: Flush after this many writes; if ``None``,
+            only flush on an explicit call to ``flush``, on the interval
+            given by ``flush_interval``, or at process exit
+        :param int flush_interval: Flush pending writes from a background
+            thread every this many milliseconds
 
         """
         # Build filename
@@ -157,39 +458,468 @@ class PickleStorage(Storage):
         else:
             self.filename = filename
 
+        self.journal_filename = self.filename + '.log'
+        self._init_state(
+            journal=journal,
+            compact_threshold=compact_threshold,
+            compact_ratio=compact_ratio,
+            flush_every=flush_every,
+            flush_interval=flush_interval,
+        )
+
+        self._load()
+
+        if self.flush_interval:
+            flusher = threading.Thread(
+                target=_flush_periodically,
+                args=(weakref.ref(self), self.flush_interval / 1000.0),
+            )
+            flusher.daemon = True
+            flusher.start()
+        if self.flush_every != 1:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _init_state(self, journal=False, compact_threshold=None,
+                    compact_ratio=None, flush_every=1, flush_interval=None):
+        """Set up the write policy, locks, and an empty store and indexes.
+        Shared by subclasses that do not call `__init__`; see
+        :class:`PickleStorage` for the parameters.
+        """
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._journal_fp = None
+        self._compactor = None
+        self._dirty = False
+        self._pending_writes = 0
+
+        # Serializes writers against each other and against the start of a
+        # compaction; readers never take it
+        self._lock = threading.RLock()
+        # Held for the whole of a compaction, so that an explicit compaction
+        # cannot overlap a background one
+        self._compact_lock = threading.Lock()
+
         # Initialize empty store
         self.store = {}
 
-        # Load file if exists
+        # Secondary indexes, built on first use; see `_ensure_index`
+        self._indexed_fields = set()
+        self._indexes = {}
+        self._primary_name = None
+
+    def _load(self):
+        """Load the store from disk, if the collection has been saved.
+        """
+        # Records are kept frozen so that they can be handed out without
+        # copying
         if os.path.exists(self.filename):
-            with open(self.filename, 'rb') as fp:
-                data = fp.read()
-                self.store = pickle.loads(data)
+            self.store = _read_records(self.filename)
+
+        # Replay journaled writes on top of the snapshot, then fold them into
+        # a new snapshot so that the journal starts out empty. This is done
+        # even if journaling is off, or the store would come back stale.
+        if self._replay_journal():
+            self._write_snapshot()
+            self._delete_journal()
+
+    @property
+    def _journal_filenames(self):
+        """Journal segments in replay order. The first is only present while
+        a compaction is running, or if one was interrupted.
+        """
+        return [self.journal_filename + '.old', self.journal_filename]
 
     def _delete_file(self):
         try:
             os.remove(self.filename)
         except OSError:
             pass
+        self._delete_journal()
 
-    def insert(self, primary_name, key, value):
-        if key not in self.store:
-            self.store[key] = copy.deepcopy(value)
-            self.flush()
+    def _delete_journal(self):
+        self._close_journal()
+        for filename in self._journal_filenames:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def _close_journal(self):
+        if self._journal_fp is not None:
+            self._journal_fp.close()
+            self._journal_fp = None
+
+    def _replay_journal(self):
+        """Apply journaled writes to the store.
+
+        :returns: Number of records replayed
+
+        """
+        count = 0
+
+        for filename in self._journal_filenames:
+            if not os.path.exists(filename):
+                continue
+            with open(filename, 'rb') as fp:
+                while True:
+                    try:
+                        op, key, value = pickle.load(fp)
+                    except EOFError:
+                        break
+                    except Exception:
+                        # Torn trailing record from an interrupted write;
+                        # later records cannot exist, so stop here
+                        logger.warning(
+                            'Discarding truncated record in journal '
+                            '{0}'.format(filename)
+                        )
+                        break
+                    self._apply(op, key, freeze(value))
+                    count += 1
+
+        return count
+
+    def _apply(self, op, key, value=None):
+        """Apply a single write to the in-memory store.
+
+        :param str op: One of ``insert``, ``update``, ``unset``, or ``remove``
+        :param key: Primary key of the record
+        :param value: Frozen record for ``insert``; frozen changed fields for
+            ``update``; tuple of removed keys for ``unset``
+
+        """
+        if op == 'insert':
+            self._reindex(key, self.store.get(key), value)
+            self.store[key] = value
+        elif op == 'update':
+            if key in self.store:
+                old_record = self.store[key]
+                record = dict(old_record)
+                record.update(value)
+                record = FrozenDict(record)
+                self._reindex(key, old_record, record, fields=value)
+                self.store[key] = record
+        elif op == 'unset':
+            if key in self.store:
+                old_record = self.store[key]
+                record = FrozenDict(
+                    (field, field_value)
+                    for field, field_value in old_record.items()
+                    if field not in value
+                )
+                self._reindex(key, old_record, record, fields=value)
+                self.store[key] = record
+        elif op == 'remove':
+            self._reindex(key, self.store.pop(key, None), None)
         else:
-            msg = 'Key ({key}) already exists'.format(key=key)
-            raise KeyExistsException(msg)
+            raise ValueError('Unknown journal operation <{0}>'.format(op))
 
-    def update(self, query, data):
-        data = copy.deepcopy(data)
-        for pk in self.find(query, by_pk=True):
-            for key, value in data.items():
-                self.store[pk][key] = value
+    # Indexing
+
+    def _ensure_index(self, key):
+        """Register a field for hash indexing. The index itself is built the
+        first time a query can use it.
+        """
+        self._indexed_fields.add(key)
+
+    def _get_index(self, field_name):
+        """Get the index on a field, building it if necessary.
+
+        :returns: :class:`OrderedIndex`, or None if the field is not indexed
+
+        """
+        if field_name not in self._indexed_fields:
+            return None
+        try:
+            return self._indexes[field_name]
+        except KeyError:
+            pass
+        with self._lock:
+            index = OrderedIndex(field_name)
+            index.build(self.store)
+            self._indexes[field_name] = index
+        return index
+
+    def _reindex(self, key, old_record, new_record, fields=None):
+        """Keep built indexes in sync with a write.
+
+        :param key: Primary key of the record
+        :param old_record: Record before the write, or None
+        :param new_record: Record after the write, or None
+        :param fields: Optional collection of changed field names
+
+        """
+        for field_name, index in six.iteritems(self._indexes):
+            if fields is not None and field_name not in fields:
+                continue
+            index.discard(key, old_record)
+            if new_record is not None:
+                index.add(key, new_record)
+
+    def _plan(self, query):
+        """Choose index lookups that narrow the records a query can match.
+        Leaf predicates on indexed fields are resolved through their index;
+        ``and`` groups use their most selective resolvable child, and ``or``
+        groups union their children if all of them are resolvable. Anything
+        else requires a scan.
+
+        Candidates are a superset of the matching records; callers still
+        apply the full query to each of them.
+
+        :param query: Query object
+        :returns: Tuple of (estimated number of candidates, function returning
+            the set of candidate primary keys), or None if no index applies
+
+        """
+        if isinstance(query, QueryGroup):
+            plans = [self._plan(node) for node in query.nodes]
+            if query.operator == 'and':
+                plans = [plan for plan in plans if plan is not None]
+                if not plans:
+                    return None
+                return min(plans, key=lambda plan: plan[0])
+            if query.operator == 'or':
+                if not plans or None in plans:
+                    return None
+                return (
+                    sum(plan[0] for plan in plans),
+                    lambda: set().union(*[plan[1]() for plan in plans]),
+                )
+            return None
+
+        if not isinstance(query, RawQuery):
+            return None
+
+        attribute, operator, argument = \
+            query.attribute, query.operator, query.argument
+
+        if operator in ('gt', 'gte', 'lt', 'lte'):
+            index = self._get_index(attribute)
+            if index is None:
+                return None
+            count = index.count_range(operator, argument)
+            if count is None:
+                return None
+            return count, lambda: index.range(operator, argument)
+
+        if operator == 'eq':
+            values = [argument]
+        elif operator == 'in' and \
+                isinstance(argument, (list, tuple, set, frozenset)):
+            values = argument
+        else:
+            return None
+
+        # Records are keyed on their primary key, so no separate index is
+        # needed for it
+        if attribute == self._primary_name:
+            try:
+                keys = set(value for value in values if value in self.store)
+            except TypeError:
+                return None
+            return len(keys), lambda: keys
+
+        index = self._get_index(attribute)
+        if index is None:
+            return None
+        count = index.count(values)
+        if count is None:
+            return None
+        return count, lambda: index.lookup(values)
+
+    def _index_candidates(self, query):
+        """Use indexes to narrow the records that can match a query.
+
+        :param query: Query object
+        :returns: Set of primary keys that is a superset of the matching
+            records, or None if no index applies
+
+        """
+        plan = self._plan(query)
+        if plan is None:
+            return None
+        return plan[1]()
+
+    def _append(self, op, key, value=None):
+        """Append a write to the journal. Values are thawed, as in snapshots.
+        """
+        if self._journal_fp is None:
+            self._journal_fp = open(self.journal_filename, 'ab')
+        pickle.dump((op, key, thaw(value)), self._journal_fp, -1)
+
+    def _write_snapshot(self, store=None):
+        """Atomically replace the pickle file with the current store.
+
+        :param dict store: Records to write; defaults to the live store
+
+        """
+        store = self.store if store is None else store
+        _write_records(store, self.filename)
+
+    def _should_compact(self):
+        if self._journal_fp is None:
+            return False
+        size = self._journal_fp.tell()
+        if self.compact_threshold is not None and size >= self.compact_threshold:
+            return True
+        if self.compact_ratio is not None:
+            try:
+                snapshot_size = os.path.getsize(self.filename)
+            except OSError:
+                snapshot_size = 0
+            return size >= self.compact_ratio * max(snapshot_size, 1)
+        return False
+
+    def _maybe_compact(self):
+        """Start a background compaction if the journal has outgrown the
+        configured thresholds and none is already running.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if not self._should_compact():
+            return
+        self._compactor = threading.Thread(target=self._compact_in_background)
+        self._compactor.daemon = True
+        self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception(
+                'Background compaction of {0} failed'.format(self.filename)
+            )
+
+    def compact(self):
+        """Write a fresh snapshot of the store and start an empty journal.
+
+        Writers are blocked only while the store is copied and the journal is
+        rotated; the snapshot itself is written without holding the lock, and
+        readers are never blocked. Writes made while the snapshot is being
+        written go to the new journal, which is replayed over the snapshot on
+        load. Compactions run one at a time.
+        """
+        if not self.journal:
+            self.flush()
+            return
+
+        with self._compact_lock:
+            with self._lock:
+                store = dict(self.store)
+                self._close_journal()
+                old_filename = self._journal_filenames[0]
+                if os.path.exists(self.journal_filename):
+                    if os.path.exists(old_filename):
+                        # Left by a compaction that failed; its writes are
+                        # not in the snapshot yet, so keep them
+                        _append_file(self.journal_filename, old_filename)
+                        os.remove(self.journal_filename)
+                    else:
+                        _replace(self.journal_filename, old_filename)
+
+            self._write_snapshot(store)
+
+            try:
+                os.remove(old_filename)
+            except OSError:
+                pass
+
+    def insert(self, primary_name, key, value):
+        self._primary_name = primary_name
+        with self._lock:
+            if key not in self.store:
+                value = freeze(value)
+                self._apply('insert', key, value)
+                if self.journal:
+                    self._append('insert', key, value)
+                self._mark_dirty()
+            else:
+                msg = 'Key ({key}) already exists'.format(key=key)
+                raise KeyExistsException(msg)
+
+    def update(self, query, data, unset=None):
+        data = FrozenDict(data)
+        unset = tuple(unset or ())
+        if not data and not unset:
+            return
+        with self._lock:
+            written = False
+            for pk in self.find(query, by_pk=True):
+                if data:
+                    self._apply('update', pk, data)
+                    if self.journal:
+                        self._append('update', pk, data)
+                if unset:
+                    self._apply('unset', pk, unset)
+                    if self.journal:
+                        self._append('unset', pk, unset)
+                written = True
+            # Don't rewrite the collection if nothing matched
+            if written:
+                self._mark_dirty()
+
+    def modify(self, query, inc=None, push=None, add_to_set=None, pull=None):
+        with self._lock:
+            pks = list(self.find(query, by_pk=True))
+            for pk in pks:
+                changes = FrozenDict(apply_operators(
+                    self.store[pk], inc, push, add_to_set, pull
+                ))
+                self._apply('update', pk, changes)
+                if self.journal:
+                    self._append('update', pk, changes)
+            if pks:
+                self._mark_dirty()
+
+    def insert_many(self, primary_name, records):
+        """Insert several records, counting them as a single write for the
+        flush policy. No record is inserted if any key already exists.
+        """
+        self._primary_name = primary_name
+        with self._lock:
+            keys = set()
+            for key, _ in records:
+                if key in self.store or key in keys:
+                    msg = 'Key ({key}) already exists'.format(key=key)
+                    raise KeyExistsException(msg)
+                keys.add(key)
+            for key, value in records:
+                value = freeze(value)
+                self._apply('insert', key, value)
+                if self.journal:
+                    self._append('insert', key, value)
+            if keys:
+                self._mark_dirty()
+
+    def update_many(self, primary_name, records):
+        """Update several records by primary key, counting them as a single
+        write for the flush policy.
+        """
+        self._primary_name = primary_name
+        with self._lock:
+            written = False
+            for key, data in records:
+                if not data or key not in self.store:
+                    continue
+                data = FrozenDict(data)
+                self._apply('update', key, data)
+                if self.journal:
+                    self._append('update', key, data)
+                written = True
+            if written:
+                self._mark_dirty()
 
     def get(self, primary_name, key):
-        data = self.store.get(key)
-        if data is not None:
-            return copy.deepcopy(data)
+        self._primary_name = primary_name
+        return self.store.get(key)
+
+    def get_many(self, primary_name, keys):
+        self._primary_name = primary_name
+        store = self.store
+        return dict((key, store[key]) for key in keys if key in store)
 
     def _remove_by_pk(self, key, flush=True):
         """Retrieve value from store.
@@ -197,24 +927,51 @@ class PickleStorage(Storage):
         :param key: Key
 
         """
-        try:
-            del self.store[key]
-        except Exception as error:
-            pass
-        if flush:
-            self.flush()
+        with self._lock:
+            self._apply('remove', key)
+            if self.journal:
+                self._append('remove', key)
+            if flush:
+                self._mark_dirty()
 
     def remove(self, query=None):
-        for key in self.find(query, by_pk=True):
-            self._remove_by_pk(key, flush=False)
-        self.flush()
+        with self._lock:
+            keys = list(self.find(query, by_pk=True))
+            for key in keys:
+                self._remove_by_pk(key, flush=False)
+            if keys:
+                self._mark_dirty()
+
+    def _mark_dirty(self):
+        """Record a write, flushing if the durability policy calls for it.
+        """
+        self._dirty = True
+        self._pending_writes += 1
+        if self.flush_every and self._pending_writes >= self.flush_every:
+            self.flush()
+
+    def _flush_if_dirty(self):
+        with self._lock:
+            if self._dirty:
+                self.flush()
+
+    def _flush(self):
+        if self.journal:
+            if self._journal_fp is not None:
+                self._journal_fp.flush()
+                self._maybe_compact()
+            return
+        self._write_snapshot()
 
     def flush(self):
-        with open(self.filename, 'wb') as fp:
-            pickle.dump(self.store, fp, -1)
+        with self._lock:
+            self._flush()
+            self._dirty = False
+            self._pending_writes = 0
 
     def find_one(self, query=None, **kwargs):
-        results = list(self.find(query))
+        # A second match is enough to know the query is ambiguous
+        results = list(self.find(query, limit=2, defer=kwargs.get('defer')))
         if len(results) == 1:
             return results[0]
         elif len(results) == 0:
@@ -225,39 +982,43 @@ class PickleStorage(Storage):
                 'returned {0}'.format(len(results))
             )
 
-    def _match(self, value, query):
-
-        if isinstance(query, QueryGroup):
-
-            matches = [self._match(value, node) for node in query.nodes]
-
-            if query.operator == 'and':
-                return all(matches)
-            elif query.operator == 'or':
-                return any(matches)
-            elif query.operator == 'not':
-                return not any(matches)
-            else:
-                raise ValueError('QueryGroup operator must be <and>, <or>, or <not>.')
-
-        elif isinstance(query, RawQuery):
-            attribute, operator, argument = \
-                query.attribute, query.operator, query.argument
-
-            return operators[operator](value[attribute], argument)
-
-        else:
-            raise TypeError('Query must be a QueryGroup or Query object.')
-
     def find(self, query=None, **kwargs):
+        offset = kwargs.get('offset') or 0
+        limit = kwargs.get('limit')
+        results = self._find(query, kwargs.get('by_pk'))
+        if offset or limit is not None:
+            stop = None if limit is None else offset + limit
+            results = itertools.islice(results, offset, stop)
+        defer = kwargs.get('defer')
+        if defer and not kwargs.get('by_pk'):
+            defer = frozenset(defer)
+            results = (
+                FrozenDict(
+                    (key, value) for key, value in six.iteritems(record)
+                    if key not in defer
+                )
+                for record in results
+            )
+        return results
+
+    def _find(self, query, by_pk):
         if query is None:
-            for key, value in six.iteritems(self.store):
-                yield value
-        else:
-            # TODO: Making this a generator breaks it, since it can change
-            for key, value in list(six.iteritems(self.store)):
-                if self._match(value, query):
-                    if kwargs.get('by_pk'):
-                        yield key
-                    else:
-                        yield value
+            # Query sets consume results lazily, so iterate over a snapshot of
+            # the keys in case records are written or removed meanwhile
+            for key in list(self.store):
+                if by_pk:
+                    yield key
+                elif key in self.store:
+                    yield self.store[key]
+            return
+        match = compile_query(query)
+        candidates = self._index_candidates(query)
+        if candidates is None:
+            candidates = list(self.store)
+        for key in candidates:
+            value = self.store.get(key)
+            if value is not None and match(value):
+                if by_pk:
+                    yield key
+                else:
+                    yield value
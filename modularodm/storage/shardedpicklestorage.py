@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import os
+import zlib
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+import six
+
+from .picklestorage import PickleStorage, _read_records, _write_records
+
+
+def shard_for(key, shards):
+    """Get the shard holding a primary key. Unlike the builtin `hash`, the
+    result is stable across processes and interpreter versions.
+
+    :param key: Primary key
+    :param int shards: Number of shards
+    :returns: Shard number
+
+    """
+    if isinstance(key, six.binary_type):
+        data = key
+    else:
+        data = six.text_type(key).encode('utf-8')
+    return (zlib.crc32(data) & 0xffffffff) % shards
+
+
+class ShardedStore(MutableMapping):
+    """Mapping of primary keys to records, partitioned across shard files.
+    Each shard is read the first time one of its keys is accessed, and
+    shards changed since the last flush are tracked in `dirty`.
+
+    :param list filenames: Filename of each shard
+
+    """
+    def __init__(self, filenames):
+        self.filenames = filenames
+        self.shards = {}
+        self.dirty = set()
+
+    def shard(self, number):
+        """Get the records in a shard, loading them if necessary.
+        """
+        try:
+            return self.shards[number]
+        except KeyError:
+            pass
+        filename = self.filenames[number]
+        records = _read_records(filename) if os.path.exists(filename) else {}
+        return self.shards.setdefault(number, records)
+
+    def _shard_for(self, key):
+        return shard_for(key, len(self.filenames))
+
+    def __getitem__(self, key):
+        return self.shard(self._shard_for(key))[key]
+
+    def __setitem__(self, key, value):
+        number = self._shard_for(key)
+        self.shard(number)[key] = value
+        self.dirty.add(number)
+
+    def __delitem__(self, key):
+        number = self._shard_for(key)
+        del self.shard(number)[key]
+        self.dirty.add(number)
+
+    def __contains__(self, key):
+        return key in self.shard(self._shard_for(key))
+
+    def __iter__(self):
+        for number in range(len(self.filenames)):
+            for key in self.shard(number):
+                yield key
+
+    def __len__(self):
+        return sum(
+            len(self.shard(number)) for number in range(len(self.filenames))
+        )
+
+
+class ShardedPickleStorage(PickleStorage):
+    """Pickle storage that partitions records across several files by a hash
+    of their primary keys. Flushing rewrites only the shards changed since
+    the last flush, and shards are loaded on first access, so `get` on a
+    fresh storage reads a single file.
+
+    Journaling is not supported, since only dirty shards are rewritten.
+    """
+
+    def __init__(self, collection_name, shards=16, prefix='db_', ext='pkl',
+                 flush_every=1, flush_interval=None):
+        """Build shard file names.
+
+        :param collection_name: Collection name
+        :param int shards: Number of shards. Records are assigned to shards
+            by primary key, so this must not change once data is stored.
+        :param prefix: File prefix.
+        :param ext: File extension.
+        :param int flush_every: See :class:`PickleStorage`
+        :param int flush_interval: See :class:`PickleStorage`
+
+        """
+        self.shards = shards
+        super(ShardedPickleStorage, self).__init__(
+            collection_name,
+            prefix=prefix,
+            ext=ext,
+            flush_every=flush_every,
+            flush_interval=flush_interval,
+        )
+
+    @property
+    def shard_filenames(self):
+        root, ext = os.path.splitext(self.filename)
+        return [
+            '{0}.{1}{2}'.format(root, number, ext)
+            for number in range(self.shards)
+        ]
+
+    def _load(self):
+        self.store = ShardedStore(self.shard_filenames)
+
+    def _delete_file(self):
+        for filename in self.shard_filenames:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def _flush(self):
+        dirty, self.store.dirty = self.store.dirty, set()
+        for number in sorted(dirty):
+            _write_records(
+                self.store.shards[number],
+                self.store.filenames[number],
+            )
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import struct
+import itertools
+
+from .base import Storage
+from .picklestorage import PickleQuerySet, compile_query, _replace
+from ..query.query import RawQuery
+from modularodm.frozen import thaw
+from modularodm.exceptions import (
+    DatabaseError,
+    MultipleResultsFound,
+    NoResultsFound,
+)
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+# Snapshot layout: MAGIC, then one pickled record after another, then the
+# pickled header, then the offset of the header as an unsigned 64-bit int.
+# The header holds the primary key name and the (start, stop) offsets of
+# each record, in export order.
+MAGIC = b'MODMSNAP1\n'
+FOOTER = struct.Struct('<Q')
+
+
+def export(storage, filename, primary_name='_id'):
+    """Write the records of a storage object to a snapshot file readable by
+    :class:`SnapshotStorage`. The file is written to a temporary name and
+    renamed into place, so readers never see a partial snapshot.
+
+    :param Storage storage: Storage to export
+    :param str filename: Snapshot file name
+    :param str primary_name: Name of the primary key of the records
+    :returns: Number of records exported
+
+    """
+    tmp_filename = filename + '.tmp'
+    offsets = []
+    try:
+        with open(tmp_filename, 'wb') as fp:
+            fp.write(MAGIC)
+            for record in storage.find():
+                record = thaw(record)
+                start = fp.tell()
+                pickle.dump(record, fp, -1)
+                offsets.append((record[primary_name], start, fp.tell()))
+            header_offset = fp.tell()
+            pickle.dump(
+                {'primary_name': primary_name, 'offsets': offsets}, fp, -1
+            )
+            fp.write(FOOTER.pack(header_offset))
+            fp.flush()
+            os.fsync(fp.fileno())
+        _replace(tmp_filename, filename)
+    except:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+    return len(offsets)
+
+
+class SnapshotStorage(Storage):
+    """Read-only storage over a snapshot written by :func:`export`. The file
+    is memory-mapped, and records are unpickled only when `get` or `find`
+    reach them, so processes reading the same snapshot share its pages
+    through the OS page cache. Only the offset index is held in memory.
+
+    :param str filename: Snapshot file name
+
+    """
+    QuerySet = PickleQuerySet
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise DatabaseError(
+                '{0} is not a snapshot file'.format(filename)
+            )
+        header_offset, = FOOTER.unpack(self._mmap[-FOOTER.size:])
+        header = pickle.loads(self._mmap[header_offset:-FOOTER.size])
+        self._primary_name = header['primary_name']
+        self._keys = [key for key, _, _ in header['offsets']]
+        self._offsets = dict(
+            (key, (start, stop)) for key, start, stop in header['offsets']
+        )
+
+    def _read(self, key):
+        try:
+            start, stop = self._offsets[key]
+        except (KeyError, TypeError):
+            return None
+        return pickle.loads(self._mmap[start:stop])
+
+    def _read_only(self, *args, **kwargs):
+        raise DatabaseError(
+            'Snapshot {0} is read-only'.format(self.filename)
+        )
+
+    insert = update = modify = remove = _read_only
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Unmap the snapshot file."""
+        self._mmap.close()
+
+    def get(self, primary_name, key):
+        return self._read(key)
+
+    def find_one(self, query=None, **kwargs):
+        results = list(self.find(query, limit=2))
+        if len(results) == 1:
+            return results[0]
+        elif len(results) == 0:
+            raise NoResultsFound()
+        else:
+            raise MultipleResultsFound(
+                'Query for find_one must return exactly one result; '
+                'returned {0}'.format(len(results))
+            )
+
+    def find(self, query=None, **kwargs):
+        offset = kwargs.get('offset') or 0
+        limit = kwargs.get('limit')
+        results = self._find(query, kwargs.get('by_pk'))
+        if offset or limit is not None:
+            stop = None if limit is None else offset + limit
+            results = itertools.islice(results, offset, stop)
+        return results
+
+    def _candidates(self, query):
+        """Look up records by primary key where the query allows it, rather
+        than reading every record.
+        """
+        if isinstance(query, RawQuery) and \
+                query.attribute == self._primary_name:
+            if query.operator == 'eq':
+                values = [query.argument]
+            elif query.operator == 'in':
+                values = query.argument
+            else:
+                return self._keys
+            try:
+                candidates = []
+                seen = set()
+                for value in values:
+                    if value in self._offsets and value not in seen:
+                        seen.add(value)
+                        candidates.append(value)
+                return candidates
+            except TypeError:
+                pass
+        return self._keys
+
+    def _find(self, query, by_pk):
+        if query is None and by_pk:
+            for key in self._keys:
+                yield key
+            return
+        match = compile_query(query) if query is not None else None
+        for key in self._candidates(query):
+            value = self._read(key)
+            if match is None or match(value):
+                yield key if by_pk else value
@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+import sqlite3
+import datetime
+import threading
+
+from bson import ObjectId
+
+from .base import Storage, apply_operators
+from ..query.queryset import BaseQuerySet
+from ..query.query import QueryGroup
+from ..query.query import RawQuery
+from ..translators import JSONTranslator
+from modularodm.exceptions import (
+    KeyExistsException,
+    MultipleResultsFound,
+    NoResultsFound,
+)
+
+
+# Name of the table recording which fields of each collection hold lists
+ARRAY_FIELDS_TABLE = '_modularodm_array_fields'
+
+# SQLite caps the number of arguments to a function, so large updates are
+# split across nested calls to `json_set`
+MAX_SET_PAIRS = 50
+
+# Older SQLite versions allow at most 999 bound parameters per statement
+MAX_VARIABLES = 500
+
+translator = JSONTranslator()
+
+
+def _quote(identifier):
+    return '"{0}"'.format(identifier.replace('"', '""'))
+
+
+def _path(attribute):
+    """Get the SQL literal for the JSON path of a field. Paths are inlined
+    rather than bound as parameters so that conditions can use expression
+    indexes.
+    """
+    path = '$."{0}"'.format(attribute.replace('"', '\\"'))
+    return "'{0}'".format(path.replace("'", "''"))
+
+
+def _column(attribute):
+    return 'json_extract(data, {0})'.format(_path(attribute))
+
+
+def _elements(attribute, condition):
+    return 'EXISTS (SELECT 1 FROM json_each(data, {0}) WHERE {1})'.format(
+        _path(attribute), condition
+    )
+
+
+def prepare_query_value(value):
+    """Convert a query argument to the form in which values are stored by
+    :class:`~modularodm.translators.JSONTranslator`.
+    """
+    if isinstance(value, datetime.datetime):
+        return translator.to_datetime(value)
+    if isinstance(value, ObjectId):
+        return translator.to_ObjectId(value)
+    if isinstance(value, (list, tuple)):
+        return [prepare_query_value(each) for each in value]
+    return value
+
+
+def _translate_in(column, argument):
+    values = [value for value in argument if value is not None]
+    conditions = []
+    if values:
+        conditions.append(
+            '{0} IN ({1})'.format(column, ', '.join('?' * len(values)))
+        )
+    if len(values) < len(argument):
+        conditions.append('{0} IS NULL'.format(column))
+    return ' OR '.join(conditions) or '0', values
+
+
+def _translate_raw(query, array_fields, primary_name):
+    attribute, operator = query.attribute, query.operator
+    argument = prepare_query_value(query.argument)
+
+    is_array = attribute in array_fields
+    is_list = isinstance(argument, list)
+
+    if attribute == primary_name and not is_array and not is_list:
+        column = 'key'
+    else:
+        column = _column(attribute)
+
+    if operator == 'eq':
+        if is_list:
+            condition = '{0} = json(?)'.format(column)
+            params = [json.dumps(argument)]
+            if is_array:
+                condition += ' OR ' + _elements(attribute, 'value = json(?)')
+                params.append(json.dumps(argument))
+            return condition, params
+        if is_array:
+            # Scalar values are their own only element
+            return _elements(attribute, 'value IS ?'), [argument]
+        return '{0} IS ?'.format(column), [argument]
+
+    if operator == 'ne':
+        if is_list:
+            return '{0} IS NOT json(?)'.format(column), [json.dumps(argument)]
+        return '{0} IS NOT ?'.format(column), [argument]
+
+    if operator in ('gt', 'gte', 'lt', 'lte'):
+        symbol = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}[operator]
+        return '{0} {1} ?'.format(column, symbol), [argument]
+
+    if operator == 'in':
+        return _translate_in(column, argument)
+
+    if operator == 'nin':
+        condition, params = _translate_in(column, argument)
+        return 'NOT coalesce({0}, 0)'.format(condition), params
+
+    if operator == 'startswith':
+        return (
+            'substr({0}, 1, length(?)) = ?'.format(column),
+            [argument, argument],
+        )
+
+    if operator == 'endswith':
+        return (
+            'substr({0}, length({0}) - length(?) + 1) = ?'.format(column),
+            [argument, argument],
+        )
+
+    if operator == 'contains':
+        condition = 'instr({0}, ?) > 0'.format(column)
+        if is_array:
+            return (
+                "json_type(data, {0}) = 'text' AND {1} OR {2}".format(
+                    _path(attribute),
+                    condition,
+                    _elements(attribute, 'value IS ?'),
+                ),
+                [argument, argument],
+            )
+        return condition, [argument]
+
+    if operator == 'icontains':
+        return 'instr(lower({0}), lower(?)) > 0'.format(column), [argument]
+
+    raise ValueError('Unsupported query operator: {0}'.format(operator))
+
+
+def translate_query(query=None, array_fields=(), primary_name=None):
+    """Translate a query tree into a parameterized SQL condition on the
+    ``data`` column of a collection.
+
+    :param query: Query object, or None to match every record
+    :param array_fields: Names of fields that hold lists in some records
+    :param str primary_name: Name of the primary key; conditions on it are
+        translated against the ``key`` column
+    :returns: Tuple of (condition, parameters)
+
+    """
+    if isinstance(query, RawQuery):
+        return _translate_raw(query, array_fields, primary_name)
+
+    elif isinstance(query, QueryGroup):
+
+        translated = [
+            translate_query(node, array_fields, primary_name)
+            for node in query.nodes
+        ]
+        conditions = ['({0})'.format(each[0]) for each in translated]
+        params = [param for each in translated for param in each[1]]
+
+        if query.operator == 'and':
+            return ' AND '.join(conditions) or '1', params
+
+        elif query.operator == 'or':
+            return ' OR '.join(conditions) or '0', params
+
+        elif query.operator == 'not':
+            # Missing values compare as NULL; count them as non-matching, as
+            # the other backends do, before negating
+            return ' AND '.join(
+                'NOT coalesce({0}, 0)'.format(condition)
+                for condition in conditions
+            ) or '1', params
+
+        else:
+            raise ValueError('QueryGroup operator must be <and>, <or>, or <not>.')
+
+    elif query is None:
+        return '1', []
+
+    else:
+        raise TypeError('Query must be a QueryGroup or Query object.')
+
+
+class SQLiteCursor(object):
+    """Lazily evaluated ``SELECT`` over a collection. Like a pymongo cursor,
+    sorting, skipping, and limiting are compiled into the statement, which
+    only runs when the cursor is iterated, indexed, or counted.
+
+    :param SQLiteStorage storage: Storage to query
+    :param str condition: SQL condition from :func:`translate_query`
+    :param list params: Parameters of the condition
+    :param bool by_pk: Yield primary keys rather than records
+
+    """
+    def __init__(self, storage, condition, params, by_pk=False):
+        self.storage = storage
+        self.condition = condition
+        self.params = params
+        self.by_pk = by_pk
+        self.order = []
+        self.skip_count = 0
+        self.limit_count = None
+
+    def clone(self):
+        clone = copy.copy(self)
+        clone.order = list(self.order)
+        return clone
+
+    def sort(self, keys):
+        """Set the sort order.
+
+        :param keys: List of (field name, descending) pairs
+
+        """
+        self.order = list(keys)
+        return self
+
+    def skip(self, n):
+        self.skip_count = n
+        return self
+
+    def limit(self, n):
+        self.limit_count = n
+        return self
+
+    def _select(self, columns):
+        if self.order:
+            order = ', '.join(
+                '{0} {1}'.format(
+                    _column(attribute),
+                    'DESC' if descending else 'ASC',
+                )
+                for attribute, descending in self.order
+            )
+        else:
+            order = 'rowid'
+        statement = 'SELECT {0} FROM {1} WHERE {2} ORDER BY {3} LIMIT ? OFFSET ?'.format(
+            columns, self.storage.table, self.condition, order,
+        )
+        limit = -1 if self.limit_count is None else self.limit_count
+        return statement, self.params + [limit, self.skip_count]
+
+    def count(self):
+        statement, params = self._select('1')
+        return self.storage._execute(
+            'SELECT count(*) FROM ({0})'.format(statement), params
+        )[0][0]
+
+    def __iter__(self):
+        statement, params = self._select('key' if self.by_pk else 'data')
+        for row in self.storage._execute(statement, params):
+            yield row[0] if self.by_pk else json.loads(row[0])
+
+    def __getitem__(self, index):
+        clone = self.clone()
+        start = self.skip_count + (
+            (index.start or 0) if isinstance(index, slice) else index
+        )
+        if self.limit_count is None:
+            stop = None
+        else:
+            stop = self.skip_count + self.limit_count
+        if isinstance(index, slice) and index.stop is not None:
+            end = self.skip_count + index.stop
+            stop = end if stop is None else min(stop, end)
+        clone.skip(start)
+        if isinstance(index, slice):
+            clone.limit(None if stop is None else max(stop - start, 0))
+            return clone
+        if stop is not None and start >= stop:
+            raise IndexError('list index out of range')
+        results = list(clone.limit(1))
+        if not results:
+            raise IndexError('list index out of range')
+        return results[0]
+
+
+class SQLiteQuerySet(BaseQuerySet):
+
+    def __init__(self, schema, cursor):
+        super(SQLiteQuerySet, self).__init__(schema)
+        self.data = cursor
+
+    def _do_getitem(self, index, raw=False):
+        if isinstance(index, slice):
+            return self._derive(self.data[index])
+        result = self.data[index]
+        if raw:
+            return result[self.primary]
+        return self._load(result)
+
+    def __iter__(self, raw=False):
+        cursor = self.data.clone()
+        if raw:
+            return [each[self.primary] for each in cursor]
+        return self._load_all(cursor)
+
+    def __len__(self):
+        return self.data.count()
+
+    count = __len__
+
+    def get_key(self, index):
+        return self._do_getitem(index, raw=True)
+
+    def get_keys(self):
+        return list(self.__iter__(raw=True))
+
+    def sort(self, *keys):
+        self.data.sort([
+            (key.lstrip('-'), key.startswith('-'))
+            for key in keys
+        ])
+        return self
+
+    def offset(self, n):
+        self.data.skip(n)
+        return self
+
+    def limit(self, n):
+        self.data.limit(n)
+        return self
+
+
+class SQLiteStorage(Storage):
+    """Store a collection as JSON documents in a SQLite table. Fields marked
+    ``index=True`` are indexed on their JSON values, and queries are
+    translated to SQL so that those indexes can be used. Every write is
+    committed immediately.
+
+    :param db: Filename of the database, or an open
+        :class:`sqlite3.Connection`
+    :param str collection: Name of the table
+
+    """
+    QuerySet = SQLiteQuerySet
+    translator = translator
+
+    def __init__(self, db, collection):
+        if isinstance(db, sqlite3.Connection):
+            self.connection = db
+        else:
+            self.connection = sqlite3.connect(db, check_same_thread=False)
+        self.collection = collection
+        self.table = _quote(collection)
+        self._lock = threading.RLock()
+        self._primary_name = None
+
+        with self._lock, self.connection:
+            self._execute(
+                'CREATE TABLE IF NOT EXISTS {0} '
+                '(key PRIMARY KEY, data TEXT NOT NULL)'.format(self.table)
+            )
+            self._execute(
+                'CREATE TABLE IF NOT EXISTS {0} '
+                '(collection TEXT, field TEXT, '
+                'PRIMARY KEY (collection, field))'.format(ARRAY_FIELDS_TABLE)
+            )
+        self._array_fields = set(
+            row[0] for row in self._execute(
+                'SELECT field FROM {0} WHERE collection = ?'.format(
+                    ARRAY_FIELDS_TABLE
+                ),
+                [collection],
+            )
+        )
+
+    def _execute(self, statement, params=()):
+        with self._lock:
+            return self.connection.execute(statement, params).fetchall()
+
+    def _translate(self, query):
+        return translate_query(query, self._array_fields, self._primary_name)
+
+    def _note_array_fields(self, data):
+        """Record fields holding lists, whose ``eq`` queries must match
+        elements rather than whole values.
+        """
+        for key, value in data.items():
+            if isinstance(value, (list, tuple)) and key not in self._array_fields:
+                self._execute(
+                    'INSERT OR IGNORE INTO {0} VALUES (?, ?)'.format(
+                        ARRAY_FIELDS_TABLE
+                    ),
+                    [self.collection, key],
+                )
+                self._array_fields.add(key)
+
+    def _ensure_index(self, key):
+        with self._lock, self.connection:
+            self._execute(
+                'CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})'.format(
+                    _quote('{0}__{1}'.format(self.collection, key)),
+                    self.table,
+                    _column(key),
+                )
+            )
+
+    def find(self, query=None, **kwargs):
+        condition, params = self._translate(query)
+        cursor = SQLiteCursor(self, condition, params, kwargs.get('by_pk'))
+        if kwargs.get('offset'):
+            cursor.skip(kwargs['offset'])
+        if kwargs.get('limit') is not None:
+            cursor.limit(kwargs['limit'])
+        return cursor
+
+    def find_one(self, query=None, **kwargs):
+        results = list(self.find(query, limit=2))
+        if len(results) == 1:
+            return results[0]
+        elif len(results) == 0:
+            raise NoResultsFound()
+        else:
+            raise MultipleResultsFound(
+                'Query for find_one must return exactly one result; '
+                'returned {0}'.format(len(results))
+            )
+
+    def get(self, primary_name, key):
+        self._primary_name = primary_name
+        rows = self._execute(
+            'SELECT data FROM {0} WHERE key = ?'.format(self.table), [key]
+        )
+        if rows:
+            return json.loads(rows[0][0])
+        return None
+
+    def get_many(self, primary_name, keys):
+        self._primary_name = primary_name
+        keys = list(keys)
+        records = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            rows = self._execute(
+                'SELECT key, data FROM {0} WHERE key IN ({1})'.format(
+                    self.table, ', '.join('?' * len(chunk))
+                ),
+                chunk,
+            )
+            for key, data in rows:
+                records[key] = json.loads(data)
+        return records
+
+    def insert(self, primary_name, key, value):
+        self.insert_many(primary_name, [(key, value)])
+
+    def insert_many(self, primary_name, records):
+        self._primary_name = primary_name
+        rows = []
+        for key, value in records:
+            if primary_name not in value:
+                value = value.copy()
+                value[primary_name] = key
+            rows.append((key, value))
+        with self._lock, self.connection:
+            for _, value in rows:
+                self._note_array_fields(value)
+            try:
+                self.connection.executemany(
+                    'INSERT INTO {0} (key, data) VALUES (?, ?)'.format(
+                        self.table
+                    ),
+                    [(key, json.dumps(value)) for key, value in rows],
+                )
+            except sqlite3.IntegrityError:
+                raise KeyExistsException
+
+    def update(self, query, data, unset=None):
+        with self._lock, self.connection:
+            self._update(query, data, unset)
+
+    def update_many(self, primary_name, records):
+        self._primary_name = primary_name
+        with self._lock, self.connection:
+            for key, data in records:
+                self._update(RawQuery(primary_name, 'eq', key), data)
+
+    def modify(self, query, inc=None, push=None, add_to_set=None, pull=None):
+        condition, params = self._translate(query)
+        with self._lock, self.connection:
+            # sqlite3 only opens a transaction implicitly at the UPDATE, so
+            # take the write lock before reading; otherwise writers using
+            # other connections could interleave
+            self._execute('BEGIN IMMEDIATE')
+            rows = self._execute(
+                'SELECT key, data FROM {0} WHERE {1}'.format(
+                    self.table, condition
+                ),
+                params,
+            )
+            for key, data in rows:
+                record = json.loads(data)
+                changes = apply_operators(record, inc, push, add_to_set, pull)
+                record.update(changes)
+                self._note_array_fields(changes)
+                self._execute(
+                    'UPDATE {0} SET data = ? WHERE key = ?'.format(self.table),
+                    [json.dumps(record), key],
+                )
+
+    def _update(self, query, data, unset=None):
+        if not data and not unset:
+            return
+        condition, params = self._translate(query)
+
+        items = list(data.items())
+        expression = 'data'
+        values = []
+        if unset:
+            expression = 'json_remove({0}, {1})'.format(
+                expression, ', '.join(_path(key) for key in unset)
+            )
+        for start in range(0, len(items), MAX_SET_PAIRS):
+            chunk = items[start:start + MAX_SET_PAIRS]
+            expression = 'json_set({0}, {1})'.format(
+                expression,
+                ', '.join('{0}, json(?)'.format(_path(key)) for key, _ in chunk),
+            )
+            values.extend(json.dumps(value) for _, value in chunk)
+        assignments = 'data = ' + expression
+        if self._primary_name is not None and self._primary_name in data:
+            assignments += ', key = ?'
+            values.append(data[self._primary_name])
+
+        self._note_array_fields(data)
+        try:
+            self._execute(
+                'UPDATE {0} SET {1} WHERE {2}'.format(
+                    self.table, assignments, condition
+                ),
+                values + params,
+            )
+        except sqlite3.IntegrityError:
+            raise KeyExistsException
+
+    def remove(self, query=None):
+        condition, params = self._translate(query)
+        with self._lock, self.connection:
+            self._execute(
+                'DELETE FROM {0} WHERE {1}'.format(self.table, condition),
+                params,
+            )
+
+    def flush(self):
+        with self._lock:
+            self.connection.commit()
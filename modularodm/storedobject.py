@@ -4,20 +4,31 @@ import six
 import copy
 import logging
 import warnings
+import threading
+import contextlib
+import collections
 from functools import wraps
 
 from . import signals
 from . import exceptions
 from .fields import Field, ListField, ForeignList, AbstractForeignList
 from .storage import Storage
+from .storage.base import apply_operators
+try:
+    from .storage import asyncstorage
+except ImportError:  # asyncio requires Python 3.4
+    asyncstorage = None
 from .query import QueryBase, RawQuery, QueryGroup
-from .frozen import FrozenDict
+from .frozen import FrozenDict, thaw
 from .cache import Cache
 from .writequeue import WriteQueue, WriteAction
 
 
 logger = logging.getLogger(__name__)
 
+# Records whose back-references changed in the current `batch_backrefs` block
+_backref_batch = threading.local()
+
 
 class ContextLogger(object):
 
@@ -228,6 +239,7 @@ class StoredObject(object):
             raise TypeError('Cannot instantiate abstract schema')
 
         self.__backrefs = {}
+        self._deferred = set()
         self._dirty = False
         self._detached = False
         self._is_loaded = kwargs.pop('_is_loaded', False)
@@ -339,7 +351,7 @@ class StoredObject(object):
             field_object = cls._fields.get(key, None)
 
             if isinstance(field_object, Field):
-                data_value = data[key]
+                data_value = value
                 if data_value is None:
                     value = None
                     result[key] = None
@@ -348,7 +360,9 @@ class StoredObject(object):
                 result[key] = value
 
             else:
-                result[key] = value
+                # Storage backends may share frozen records between readers;
+                # fields thaw their own values in `Field.from_storage`
+                result[key] = thaw(value)
 
         return result
 
@@ -375,7 +389,7 @@ class StoredObject(object):
     def _remove_backref(self, backref_key, parent, parent_field_name, strict=False):
         try:
             self.__backrefs[backref_key][parent._name][parent_field_name].remove(parent._primary_key)
-            self.save(force=True)
+            self._save_backrefs()
         except (KeyError, ValueError):
             if strict:
                 raise
@@ -391,7 +405,7 @@ class StoredObject(object):
             self._set_backref(backref_key, parent_field_name, parent)
             return True
         if updated:
-            self.save(force=True)
+            self._save_backrefs()
             return True
         return False
 
@@ -414,7 +428,17 @@ class StoredObject(object):
         if backref_value_primary_key not in append_to:
             append_to.append(backref_value_primary_key)
 
-        self.save(force=True)
+        self._save_backrefs()
+
+    def _save_backrefs(self):
+        """Save a change to back-references, or leave it to the enclosing
+        `batch_backrefs` block.
+        """
+        pending = getattr(_backref_batch, 'pending', None)
+        if pending is None:
+            self.save(force=True)
+        else:
+            pending[id(self)] = self
 
     @classmethod
     def set_storage(cls, storage):
@@ -430,6 +454,37 @@ class StoredObject(object):
 
         cls._storage.append(storage)
 
+    @classmethod
+    def set_async_storage(cls, storage):
+        """Set the storage used by `aload`, `afind`, and `asave`. Without
+        one, these run the methods of the schema's storage in the default
+        executor of the event loop.
+
+        :param AsyncStorage storage: Asynchronous storage
+        """
+        if asyncstorage is None or \
+                not isinstance(storage, asyncstorage.AsyncStorage):
+            raise TypeError(
+                'Argument to set_async_storage must be an instance of '
+                'AsyncStorage.'
+            )
+        cls._async_storage = storage
+
+    @classmethod
+    @has_storage
+    def _get_async_storage(cls):
+        if asyncstorage is None:
+            raise exceptions.ImproperConfigurationError(
+                'Asynchronous storage requires asyncio.'
+            )
+        storage = getattr(cls, '_async_storage', None)
+        if storage is None or (
+                isinstance(storage, asyncstorage.ExecutorStorage)
+                and storage.storage is not cls._storage[0]):
+            storage = asyncstorage.ExecutorStorage(cls._storage[0])
+            cls._async_storage = storage
+        return storage
+
     # Caching ################################################################
 
     @classmethod
@@ -539,7 +594,7 @@ class StoredObject(object):
     @classmethod
     @has_storage
     @log_storage
-    def load(cls, key=None, data=None, _is_loaded=True):
+    def load(cls, key=None, data=None, _is_loaded=True, _deferred=None):
         """Get a record by its primary key.
         """
         # Emit load signal
@@ -578,8 +633,133 @@ class StoredObject(object):
         ret = cls(_is_loaded=_is_loaded, **data)
         ret._stored_key = ret._primary_key
 
+        # Fields left out of the record by a projection load on first access
+        if _deferred:
+            ret._defer([name for name in _deferred if name not in data])
+
         return ret
 
+    @classmethod
+    @has_storage
+    @log_storage
+    def load_many(cls, keys):
+        """Get several records by primary key. Records in the object cache
+        are reused, and the others are fetched with one call to
+        `Storage.get_many`.
+
+        :param keys: Primary keys
+        :returns: List of records in the order of `keys`, with None for
+            missing records
+        """
+        keys = [cls._check_pk_type(key) for key in keys]
+        storage_keys = [cls._pk_to_storage(key) for key in keys]
+
+        objects = {}
+        missing = []
+        for key, storage_key in zip(keys, storage_keys):
+            if storage_key not in objects:
+                objects[storage_key] = cls._load_from_cache(key)
+                if objects[storage_key] is None:
+                    missing.append(storage_key)
+
+        if missing:
+            records = cls._storage[0].get_many(cls._primary_name, missing)
+            for key, storage_key in zip(keys, storage_keys):
+                data = records.pop(storage_key, None)
+                if data is not None:
+                    objects[storage_key] = cls.load(key, data=data)
+
+        return [objects.get(storage_key) for storage_key in storage_keys]
+
+    @classmethod
+    def _prefetch_references(cls, records, field_names):
+        """Load the records referenced by foreign fields of storage records,
+        with one call to `load_many` per target schema.
+
+        :param list records: Storage records of this schema
+        :param field_names: Names of foreign fields
+        """
+        keys = {}
+        for name in field_names:
+            field_object = cls._fields[name]
+            if isinstance(field_object, ListField):
+                values = [
+                    value
+                    for record in records
+                    for value in record.get(name) or ()
+                ]
+                field_object = field_object._field_instance
+            else:
+                values = [record.get(name) for record in records]
+            for value in values:
+                if value is None:
+                    continue
+                if field_object._is_abstract:
+                    schema = cls.get_collection(value[1])
+                    value = value[0]
+                else:
+                    schema = field_object.base_class
+                keys.setdefault(schema, []).append(value)
+
+        for schema, schema_keys in keys.items():
+            schema.load_many(schema_keys)
+
+    @classmethod
+    def aload(cls, key):
+        """Get a record by its primary key without blocking the event loop.
+
+        :param key: Primary key
+        :returns: Future resolving to the record, or None
+        """
+        storage = cls._get_async_storage()
+        key = cls._check_pk_type(key)
+        cached_object = cls._load_from_cache(key)
+        if cached_object is not None:
+            return asyncstorage.completed(cached_object)
+        return asyncstorage.then(
+            storage.aget(cls._primary_name, cls._pk_to_storage(key)),
+            lambda data: None if data is None else cls.load(key, data=data),
+        )
+
+    def _defer(self, names):
+        """Mark fields as not yet loaded from storage. Deferred fields, and
+        back-references if "__backrefs" is deferred, are loaded together the
+        first time any of them is accessed.
+
+        :param names: Field names
+        """
+        for name in names:
+            if name == '__backrefs':
+                self.__dict__.pop('_StoredObject__backrefs', None)
+            else:
+                self._fields[name].data.pop(self, None)
+            self._deferred.add(name)
+
+    def _load_deferred(self):
+        """Load deferred fields from storage."""
+        deferred, self._deferred = self._deferred, set()
+        storage_data = self._storage[0].get(
+            self._primary_name, self._storage_key
+        ) or {}
+
+        cached_data = dict(self._get_cached_data(self._storage_key) or {})
+        for key in deferred:
+            value = storage_data.get(key)
+            if key == '__backrefs':
+                self.__backrefs = thaw(value) or {}
+                continue
+            field_object = self._fields[key]
+            if key not in storage_data:
+                continue
+            cached_data[key] = value
+            # Keep values assigned since the record was loaded
+            if self in field_object.data:
+                continue
+            if value is not None:
+                value = field_object.from_storage(value)
+            field_object.__set__(self, value, safe=True)
+        self._set_cache(self._storage_key, self, cached_data)
+
     @classmethod
     def migrate_all(cls):
         """Migrate all records in this collection."""
@@ -768,6 +948,150 @@ class StoredObject(object):
             back-references
         :returns: List of changed fields
         """
+        prepared = self._prepare_save(force)
+        if prepared is None:
+            return []
+        fields_changed, storage_data, cached_data, primary_changed = prepared
+
+        self._write_to_storage(storage_data, primary_changed, cached_data)
+        self._finish_save(*prepared)
+
+        return fields_changed
+
+    def asave(self, force=False):
+        """Save a record without blocking the event loop on the write.
+        Hooks and validation run as in `save`. Records whose primary key
+        changed or that need a generated key, and saves while the write
+        queue is active, are written synchronously.
+
+        Only the write of the record itself is asynchronous. Hooks and
+        validation still run on the event loop, so checking `unique` fields
+        queries the synchronous storage, and records whose back-references
+        change are saved with `save_all` once the write completes.
+
+        :param bool force: Save even if no fields have changed
+        :returns: Future resolving to the list of changed fields
+        """
+        storage = self._get_async_storage()
+        if self.queue.active:
+            return asyncstorage.completed(self.save(force))
+
+        prepared = self._prepare_save(force)
+        if prepared is None:
+            return asyncstorage.completed([])
+        fields_changed, storage_data, cached_data, primary_changed = prepared
+
+        if self._is_loaded and not primary_changed:
+            update_data, unset = self._diff_storage_data(
+                cached_data, storage_data
+            )
+            if update_data or unset:
+                written = storage.aupdate(
+                    RawQuery(self._primary_name, 'eq', self._primary_key),
+                    update_data,
+                    unset,
+                )
+            else:
+                written = asyncstorage.completed(None)
+        elif not self._is_loaded and not (
+                self._is_optimistic and self._primary_key is None):
+            written = storage.ainsert(
+                self._primary_name,
+                self._pk_to_storage(self._primary_key),
+                storage_data,
+            )
+        else:
+            self._write_to_storage(storage_data, primary_changed, cached_data)
+            written = asyncstorage.completed(None)
+
+        def finish(result):
+            self._finish_save(*prepared)
+            return fields_changed
+
+        return asyncstorage.then(written, finish)
+
+    @classmethod
+    @log_storage
+    def save_all(cls, objects, force=False):
+        """Save several records. Hooks, signals, and validation run for each
+        record as in `save`, but new records are written with one call to
+        `Storage.insert_many` and changed records with one call to
+        `Storage.update_many` per schema. Records whose primary key changed
+        or that need a generated key are written individually.
+
+        Unique fields are validated against stored records, not against the
+        other records in the batch.
+
+        :param objects: Iterable of records
+        :param bool force: Save even if no fields have changed
+        :returns: List of the changed fields of each record
+        """
+        objects = list(objects)
+        prepared = [obj._prepare_save(force) for obj in objects]
+
+        # Group writes by schema, in order of first appearance
+        schemas = []
+        inserts = {}
+        updates = {}
+        for obj, each in zip(objects, prepared):
+            if each is None:
+                continue
+            schema = type(obj)
+            if schema not in inserts:
+                schemas.append(schema)
+                inserts[schema] = []
+                updates[schema] = []
+            storage_data, cached_data, primary_changed = each[1:]
+            if obj._is_loaded and not primary_changed:
+                update_data, unset = obj._diff_storage_data(
+                    cached_data, storage_data
+                )
+                if unset:
+                    obj._write_to_storage(storage_data, False, cached_data)
+                elif update_data:
+                    updates[schema].append((obj._primary_key, update_data))
+            elif not obj._is_loaded and not (
+                    obj._is_optimistic and obj._primary_key is None):
+                inserts[schema].append(
+                    (schema._pk_to_storage(obj._primary_key), storage_data)
+                )
+            else:
+                obj._write_to_storage(storage_data, primary_changed, cached_data)
+
+        for schema in schemas:
+            storage = schema._storage[0]
+            if inserts[schema]:
+                schema.delegate(
+                    storage.insert_many,
+                    False,
+                    schema._primary_name,
+                    inserts[schema],
+                )
+            if updates[schema]:
+                schema.delegate(
+                    storage.update_many,
+                    False,
+                    schema._primary_name,
+                    updates[schema],
+                )
+
+        results = []
+        with batch_backrefs():
+            for obj, each in zip(objects, prepared):
+                if each is None:
+                    results.append([])
+                else:
+                    obj._finish_save(*each)
+                    results.append(each[0])
+        return results
+
+    def _prepare_save(self, force=False):
+        """Run pre-save hooks and validation, and serialize the record.
+
+        :param bool force: Save even if no fields have changed
+        :returns: Tuple of (changed fields, storage data, cached data, whether
+            the primary key changed), or None if there is nothing to save
+        """
         if self._detached:
             raise exceptions.DatabaseError('Cannot save detached object.')
 
@@ -780,6 +1104,11 @@ class StoredObject(object):
             instance=self
         )
 
+        # Loading deferred fields replaces the cached data, so load them
+        # before reading it; otherwise they would all count as changed
+        if self._deferred:
+            self._load_deferred()
+
         cached_data = self._get_cached_data(self._stored_key)
         storage_data = self.to_storage()
 
@@ -792,7 +1121,7 @@ class StoredObject(object):
 
         # Quit if no diffs
         if not fields_changed and not force:
-            return []
+            return None
 
         # Apply field-level validation
         for field_name in fields_changed:
@@ -808,6 +1137,10 @@ class StoredObject(object):
             self._primary_name in fields_changed
         )
 
+        return fields_changed, storage_data, cached_data, primary_changed
+
+    def _write_to_storage(self, storage_data, primary_changed,
+                          cached_data=None):
         if self._is_loaded:
             if primary_changed and not getattr(self, '_updating_key', False):
                 self.delegate(
@@ -818,12 +1151,54 @@ class StoredObject(object):
                 self._clear_caches(self._stored_key)
                 self.insert(self._primary_key, storage_data)
             else:
-                self.update_one(self, storage_data=storage_data, saved=True, inmem=True)
+                # Only send the keys that differ from the cached record
+                update_data, unset = self._diff_storage_data(
+                    cached_data, storage_data
+                )
+                if update_data or unset:
+                    self.update_one(
+                        self, storage_data=update_data, saved=True,
+                        inmem=True, unset=unset,
+                    )
         elif self._is_optimistic and self._primary_key is None:
             self._optimistic_insert()
         else:
             self.insert(self._primary_key, storage_data)
 
+    def _diff_storage_data(self, cached_data, storage_data):
+        """Get the part of a record that must be written to bring the stored
+        record up to date. Keys missing from the cached data count as
+        changed, so partially cached records are written in full.
+        Back-references are changed in place and may be shared with the cached
+        data, so they are always sent. Only fields of the schema and
+        back-references are removed; other keys in the stored record, such
+        as those written by other schemas or older versions, are kept.
+
+        :param cached_data: Storage-formatted data from cache, or None
+        :param storage_data: Storage-formatted data from object
+        :returns: Tuple of (dict of changed keys and values, list of keys to
+            remove)
+        """
+        if cached_data is None:
+            return storage_data, []
+        update_data = dict(
+            (key, value)
+            for key, value in storage_data.items()
+            if key == '__backrefs' or key not in cached_data
+            or cached_data[key] != value
+        )
+        unset = [
+            key for key in cached_data
+            if key not in storage_data
+            and (key in self._fields or key == '__backrefs')
+        ]
+        return update_data, unset
+
+    def _finish_save(self, fields_changed, storage_data, cached_data,
+                     primary_changed):
+        """Update back-references, caches, and state after a write, and send
+        the `save` signal.
+        """
         # if primary key has changed, follow back references and update
         # AND
         # run after_save or after_save_on_difference
@@ -839,17 +1214,16 @@ class StoredObject(object):
 
         self._is_loaded = True
 
-        signals.save.send(
-            self.__class__,
-            instance=self,
-            fields_changed=fields_changed,
-            cached_data=cached_data or {},
-        )
-
-        storage_data[self._primary_name] = self._storage_key
-        self._set_cache(self._primary_key, self, storage_data)
+        with batch_backrefs():
+            signals.save.send(
+                self.__class__,
+                instance=self,
+                fields_changed=fields_changed,
+                cached_data=cached_data or {},
+            )
 
-        return fields_changed
+            storage_data[self._primary_name] = self._storage_key
+            self._set_cache(self._primary_key, self, storage_data)
 
     def update_fields(self, **kwargs):
         """Update multiple fields, specified by keyword arguments.
@@ -873,18 +1247,21 @@ class StoredObject(object):
     def reload(self):
 
         storage_data = self._storage[0].get(self._primary_name, self._storage_key)
+        if '__backrefs' in self._deferred:
+            self.__backrefs = {}
+        self._deferred = set()
 
         for key, value in storage_data.items():
             field_object = self._fields.get(key, None)
             if isinstance(field_object, Field):
-                data_value = storage_data[key]
+                data_value = value
                 if data_value is None:
                     value = None
                 else:
                     value = field_object.from_storage(data_value)
                 field_object.__set__(self, value, safe=True)
             elif key == '__backrefs':
-                self._StoredObject__backrefs = value
+                self._StoredObject__backrefs = thaw(value)
 
         self._stored_key = self._primary_key
         self._set_cache(self._storage_key, self, storage_data)
@@ -897,6 +1274,13 @@ class StoredObject(object):
             item=item
         )
 
+        # Back-references left out of a projection load on first access
+        if item == '_StoredObject__backrefs':
+            if '__backrefs' in self.__dict__.get('_deferred', ()):
+                self._load_deferred()
+                return self.__dict__[item]
+            raise AttributeError(errmsg)
+
         if item in self.__backrefs:
             backrefs = []
             for parent, rest0 in six.iteritems(self.__backrefs[item]):
@@ -980,24 +1364,71 @@ class StoredObject(object):
         """
 
         :param query:
-        :param kwargs:
+        :param kwargs: Passed to the storage backend. `only` takes a list of
+            the only fields to fetch, and `defer` a list of fields not to
+            fetch; fields left out are loaded on first access.
         :return: an iterable of :class:`StoredObject` instances
         """
         cls._process_query(query)
-        return cls._storage[0].QuerySet(
+        deferred = cls._prepare_projection(kwargs)
+        query_set = cls._storage[0].QuerySet(
             cls,
             cls._storage[0].find(query, **kwargs)
         )
+        query_set._deferred = deferred
+        return query_set
+
+    @classmethod
+    def afind(cls, query=None, **kwargs):
+        """Find records without blocking the event loop. Takes the options
+        of `find`, as well as `offset` and `limit`.
+
+        :param query:
+        :returns: Future resolving to a list of records
+        """
+        storage = cls._get_async_storage()
+        cls._process_query(query)
+        deferred = cls._prepare_projection(kwargs)
+        return asyncstorage.then(
+            storage.afind(query, **kwargs),
+            lambda records: [
+                cls.load(data=record, _deferred=deferred)
+                for record in records
+            ],
+        )
+
+    @classmethod
+    def _prepare_projection(cls, kwargs):
+        """Replace `only` and `defer` options with the `defer` option
+        understood by storage backends.
+
+        :param dict kwargs: Options to `find` or `find_one`
+        :returns: Frozen set of deferred field names
+        """
+        only = kwargs.pop('only', None)
+        defer = kwargs.pop('defer', None)
+        deferred = set(defer or ())
+        if only is not None:
+            deferred.update(
+                name for name in list(cls._fields) + ['__backrefs']
+                if name not in only
+            )
+        deferred.discard(cls._primary_name)
+        if deferred:
+            kwargs['defer'] = sorted(deferred)
+        return frozenset(deferred)
 
     @classmethod
     @has_storage
     @log_storage
     def find_one(cls, query=None, **kwargs):
         cls._process_query(query)
+        deferred = cls._prepare_projection(kwargs)
         stored_data = cls._storage[0].find_one(query, **kwargs)
         return cls.load(
             key=stored_data[cls._primary_name],
-            data=stored_data
+            data=stored_data,
+            _deferred=deferred,
         )
 
     # Queueing
@@ -1138,13 +1569,41 @@ class StoredObject(object):
 
     @classmethod
     @has_storage
-    def update_one(cls, which, data=None, storage_data=None, saved=False, inmem=False):
+    def update_one(cls, which, data=None, storage_data=None, saved=False,
+                   inmem=False, unset=None, inc=None, push=None,
+                   add_to_set=None, pull=None):
+        """Update a single record. Besides replacing values with `data`,
+        counters and lists can be changed with atomic update operators,
+        which the storage backend applies without reading the record first:
 
-        storage_data = storage_data or cls._data_to_storage(data)
-        includes_foreign = cls._includes_foreign(storage_data.keys())
+            Post.update_one(post, inc={'views': 1}, push={'tags': 'new'})
+
+        :param which: Object selector: Query, StoredObject, or primary key
+        :param dict data: New values, keyed by field name
+        :param dict inc: Amounts to add, keyed by field name
+        :param dict push: Values to append to list fields
+        :param dict add_to_set: Values to append to list fields unless
+            present
+        :param dict pull: Values to remove from list fields
+        """
+        operators = cls._operators_to_storage(
+            inc=inc, push=push, add_to_set=add_to_set, pull=pull
+        )
+        if storage_data is None and (data is not None or not operators):
+            storage_data = cls._data_to_storage(data)
         obj = cls._which_to_obj(which)
 
+        if storage_data is not None:
+            cls._update_one_data(obj, storage_data, saved, inmem, unset)
+        if operators:
+            obj._modify(operators)
+
+    @classmethod
+    def _update_one_data(cls, obj, storage_data, saved, inmem, unset):
+        includes_foreign = cls._includes_foreign(storage_data.keys())
+
         if saved or not includes_foreign:
+            kwargs = {'unset': unset} if unset else {}
             cls.delegate(
                 cls._storage[0].update,
                 False,
@@ -1152,6 +1611,7 @@ class StoredObject(object):
                     cls._primary_name, 'eq', obj._primary_key
                 ),
                 storage_data,
+                **kwargs
             )
             if obj and not inmem:
                 obj._dirty = True
@@ -1160,6 +1620,64 @@ class StoredObject(object):
         else:
             obj._update_in_memory(storage_data)
 
+    @classmethod
+    def _operators_to_storage(cls, **operators):
+        """Translate the values of update operators to storage format. Values
+        pushed to or pulled from list fields are translated as list items.
+        """
+        storage_operators = {}
+        for name, values in operators.items():
+            if not values:
+                continue
+            storage_values = {}
+            for key, value in values.items():
+                field_object = cls._fields.get(key)
+                if name != 'inc' and isinstance(field_object, ListField):
+                    field_object = field_object._field_instance
+                if field_object is not None:
+                    value = field_object.to_storage(value)
+                storage_values[key] = value
+            storage_operators[name] = storage_values
+        return storage_operators
+
+    def _modify(self, operators):
+        """Apply update operators to the stored record, then patch the cached
+        record and field values to match rather than reloading them.
+        Operators on foreign fields are applied in memory and saved, so that
+        back-references stay in sync.
+
+        :param dict operators: Update operators in storage format
+        """
+        keys = set()
+        for values in operators.values():
+            keys.update(values)
+        if self._includes_foreign(keys):
+            self._update_in_memory(
+                apply_operators(self.to_storage(), **operators)
+            )
+            return
+
+        self.delegate(
+            self._storage[0].modify,
+            False,
+            RawQuery(self._primary_name, 'eq', self._primary_key),
+            **operators
+        )
+
+        cached_data = self._get_cached_data(self._storage_key)
+        if cached_data is None:
+            changes = apply_operators(self.to_storage(), **operators)
+        else:
+            changes = apply_operators(cached_data, **operators)
+            cached_data = dict(cached_data)
+            cached_data.update(changes)
+            self._set_cache(self._primary_key, self, cached_data)
+        for key, value in changes.items():
+            field_object = self._fields[key]
+            if value is not None:
+                value = field_object.from_storage(value)
+            field_object.__set__(self, value, safe=True)
+
     @classmethod
     @has_storage
     def update(cls, query, data=None, storage_data=None):
@@ -1314,6 +1832,26 @@ def _collect_refs(obj, fields=None):
 
     return refs
 
+@contextlib.contextmanager
+def batch_backrefs():
+    """Collect the records whose back-references change within the block,
+    and save each of them once, with one `save_all` call per schema, when
+    the outermost block exits.
+    """
+    if getattr(_backref_batch, 'pending', None) is not None:
+        yield
+        return
+    _backref_batch.pending = collections.OrderedDict()
+    try:
+        yield
+    finally:
+        schemas = collections.OrderedDict()
+        for obj in _backref_batch.pending.values():
+            schemas.setdefault(type(obj), []).append(obj)
+        _backref_batch.pending = None
+        for schema, objects in schemas.items():
+            schema.save_all(objects, force=True)
+
 def rm_back_refs(obj):
     """When removing an object with foreign fields, back-references from
     other objects to the current object should be deleted. This function
@@ -1324,13 +1862,14 @@ def rm_back_refs(obj):
     :param obj: Object for which back-references should be removed
 
     """
-    for ref in _collect_refs(obj):
-        ref['value']._remove_backref(
-            ref['field_instance']._backref_field_name,
-            obj,
-            ref['field_name'],
-            strict=False
-        )
+    with batch_backrefs():
+        for ref in _collect_refs(obj):
+            ref['value']._remove_backref(
+                ref['field_instance']._backref_field_name,
+                obj,
+                ref['field_name'],
+                strict=False
+            )
 
 def ensure_backrefs(obj, fields=None):
     """Ensure that all forward references on the provided object have the
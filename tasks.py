@@ -14,6 +14,16 @@ def mongo(daemon=False, port=20771):
         cmd += " --fork"
     run(cmd)
 
+@task
+def export_snapshot(collection, out=None, primary='_id', prefix='db_'):
+    '''Export a pickled collection to a read-only snapshot file.
+    '''
+    from modularodm.storage import PickleStorage
+    from modularodm.storage.snapshotstorage import export
+    out = out or '{0}{1}.snap'.format(prefix, collection)
+    count = export(PickleStorage(collection, prefix=prefix), out, primary)
+    print("Exported {0} records to {1}.".format(count, out))
+
 @task
 def test(coverage=False, browse=False):
     command = "nosetests"
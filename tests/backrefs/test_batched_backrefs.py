@@ -0,0 +1,66 @@
+import mock
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject
+from modularodm.fields import ForeignField, IntegerField
+from modularodm.storedobject import batch_backrefs
+
+from tests.base import ModularOdmTestCase
+
+
+class BatchedBackrefsTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Foo(StoredObject):
+            _id = IntegerField()
+            my_bar = ForeignField('Bar', list=True, backref='my_foo')
+            first_bar = ForeignField('Bar', backref='first_foo')
+
+        class Bar(StoredObject):
+            _id = IntegerField()
+
+        return Foo, Bar
+
+    def set_up_objects(self):
+        self.bars = [self.Bar(_id=idx) for idx in range(100)]
+        self.Bar.save_all(self.bars)
+
+    def test_one_write_per_save(self):
+        foo = self.Foo(_id=1, my_bar=self.bars, first_bar=self.bars[0])
+        with mock.patch.object(self.Bar, 'save') as save:
+            with self.spy(self.Bar, 'update_many') as update_many:
+                foo.save()
+        assert_equal(save.call_count, 0)
+        assert_equal(update_many.call_count, 1)
+        # The first Bar gains two back-references but is written once
+        assert_equal(len(update_many.call_args[0][1]), 100)
+
+        self.Bar._clear_caches()
+        bar = self.Bar.load(0)
+        assert_equal(bar.my_foo[0]._id, 1)
+        assert_equal(bar.first_foo[0]._id, 1)
+
+    def test_removals_are_batched(self):
+        foo = self.Foo(_id=1, my_bar=self.bars)
+        foo.save()
+        foo.my_bar = self.bars[:10]
+        with self.spy(self.Bar, 'update_many') as update_many:
+            foo.save()
+        assert_equal(update_many.call_count, 1)
+        assert_equal(len(update_many.call_args[0][1]), 90)
+        self.Bar._clear_caches()
+        assert_equal(len(self.Bar.load(5).my_foo), 1)
+        assert_equal(len(self.Bar.load(50).my_foo), 0)
+
+    def test_nested_blocks_flush_once(self):
+        with self.spy(self.Bar, 'update_many') as update_many:
+            with batch_backrefs():
+                self.Foo(_id=1, my_bar=self.bars[:5]).save()
+                self.Foo(_id=2, my_bar=self.bars[:5]).save()
+                assert_equal(update_many.call_count, 0)
+        assert_equal(update_many.call_count, 1)
+        self.Bar._clear_caches()
+        assert_equal(
+            sorted(foo._id for foo in self.Bar.load(3).my_foo),
+            [1, 2],
+        )
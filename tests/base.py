@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
+import mock
+import glob
 import inspect
 import os
 import pymongo
@@ -8,7 +10,10 @@ import uuid
 import six
 
 from modularodm import StoredObject
-from modularodm.storage import MongoStorage, PickleStorage, EphemeralStorage
+from modularodm.storage import (
+    MongoStorage, PickleStorage, ShardedPickleStorage, EphemeralStorage,
+    SQLiteStorage, DbmStorage,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +54,54 @@ class PickleStorageMixin(object):
                 pass
 
 
+class ShardedPickleStorageMixin(object):
+    fixture_suffix = 'ShardedPickle'
+
+    def make_storage(self):
+        try:
+            self.sharded_storages
+        except AttributeError:
+            self.sharded_storages = []
+
+        storage = ShardedPickleStorage(str(uuid.uuid4())[:8], shards=4)
+        self.sharded_storages.append(storage)
+        return storage
+
+    def clean_up_storage(self):
+        for storage in self.sharded_storages:
+            storage._delete_file()
+
+
+class DbmStorageMixin(object):
+    fixture_suffix = 'Dbm'
+
+    def make_storage(self):
+        try:
+            self.dbm_storages
+        except AttributeError:
+            self.dbm_storages = []
+
+        storage = DbmStorage(str(uuid.uuid4())[:8])
+        self.dbm_storages.append(storage)
+        return storage
+
+    def clean_up_storage(self):
+        for storage in self.dbm_storages:
+            storage.close()
+            for f in glob.glob(storage.filename + '*'):
+                os.remove(f)
+
+
+class SQLiteStorageMixin(object):
+    fixture_suffix = 'SQLite'
+
+    def make_storage(self):
+        return SQLiteStorage(':memory:', str(uuid.uuid4())[:8])
+
+    def clean_up_storage(self):
+        pass
+
+
 class MongoStorageMixin(object):
     fixture_suffix = 'Mongo'
 
@@ -102,6 +155,9 @@ class MultipleBackendMeta(type):
             PickleStorageMixin,
             MongoStorageMixin,
             EphemeralStorageMixin,
+            SQLiteStorageMixin,
+            DbmStorageMixin,
+            ShardedPickleStorageMixin,
         ):
             new_name = '{}{}'.format(name, mixin.fixture_suffix)
             frame.f_globals[new_name] = type.__new__(
@@ -133,6 +189,18 @@ class ModularOdmTestCase(unittest.TestCase):
 
         self.set_up_objects()
 
+    def spy(self, schema, method):
+        """Patch a method of a schema's storage with a mock that records
+        calls and passes them through. Use as a context manager.
+
+        :param schema: StoredObject subclass
+        :param str method: Name of the storage method
+        """
+        storage = schema._storage[0]
+        return mock.patch.object(
+            storage, method, wraps=getattr(storage, method)
+        )
+
     def set_up_storage(self):
         super(ModularOdmTestCase, self).set_up_storage()
 
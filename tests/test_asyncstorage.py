@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import unittest
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields, exceptions
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import EphemeralStorage
+
+try:
+    import asyncio
+    from pymongo.errors import DuplicateKeyError
+    from modularodm.storage import asyncstorage
+except ImportError:
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        class Post(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            title = fields.StringField()
+            views = fields.IntegerField(default=0)
+        self.storage = EphemeralStorage()
+        Post.set_storage(self.storage)
+        self.Post = Post
+
+    def tearDown(self):
+        self.Post._clear_caches()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, future):
+        return self.loop.run_until_complete(future)
+
+    def test_asave_and_aload(self):
+        post = self.Post(_id=1, title='hello')
+        assert_equal(
+            sorted(self.wait(post.asave())),
+            ['_id', 'title', 'views'],
+        )
+        assert_true(post._is_loaded)
+        assert_equal(self.storage.get('_id', 1)['title'], 'hello')
+        assert_is(self.wait(self.Post.aload(1)), post)
+
+        self.Post._clear_caches()
+        loaded = self.wait(self.Post.aload(1))
+        assert_equal(loaded.title, 'hello')
+        assert_is_none(self.wait(self.Post.aload(2)))
+
+    def test_asave_sends_changed_fields(self):
+        post = self.Post(_id=1, title='hello')
+        post.save()
+        post.views = 10
+        assert_equal(self.wait(post.asave()), set(['views']))
+        assert_equal(self.wait(post.asave()), [])
+        self.Post._clear_caches()
+        assert_equal(self.Post.load(1).views, 10)
+
+    def test_afind(self):
+        for idx in range(5):
+            self.Post(_id=idx, title='post {0}'.format(idx), views=idx).save()
+        self.Post._clear_caches()
+        posts = self.wait(
+            self.Post.afind(Q('views', 'gte', 2), only=['views'])
+        )
+        assert_equal(sorted(post._id for post in posts), [2, 3, 4])
+        assert_equal(
+            sorted(post.title for post in posts),
+            ['post 2', 'post 3', 'post 4'],
+        )
+
+    def test_insert_errors_reach_caller(self):
+        self.Post(_id=1).save()
+        self.Post._clear_caches()
+        with assert_raises(exceptions.KeyExistsException):
+            self.wait(self.Post(_id=1).asave())
+
+    def test_then_chains_futures(self):
+        future = asyncstorage.then(
+            asyncstorage.completed(2),
+            lambda value: asyncstorage.completed(value * 3),
+        )
+        assert_equal(self.wait(future), 6)
+
+    def test_set_async_storage(self):
+        with assert_raises(TypeError):
+            self.Post.set_async_storage(self.storage)
+        storage = asyncstorage.ExecutorStorage(self.storage)
+        self.Post.set_async_storage(storage)
+        assert_is(self.Post._get_async_storage(), storage)
+
+
+def _matches(record, query):
+    for key, condition in query.items():
+        value = record.get(key)
+        if isinstance(condition, dict):
+            if not all(
+                    operator == '$gte' and value is not None
+                    and value >= argument
+                    for operator, argument in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class StubCursor(object):
+    """Cursor of `StubCollection`, with the methods of Motor's cursor used by
+    `AsyncMongoStorage`.
+    """
+    def __init__(self, records):
+        self.records = records
+
+    def skip(self, offset):
+        return StubCursor(self.records[offset:])
+
+    def limit(self, limit):
+        return StubCursor(self.records[:limit])
+
+    def to_list(self, length):
+        return asyncstorage.completed(self.records)
+
+
+class StubCollection(object):
+    """In-memory collection whose methods return futures, like Motor's
+    `AsyncIOMotorCollection`. Supports equality and `$gte` queries.
+    """
+    def __init__(self):
+        self.records = []
+        self.calls = []
+
+    def find_one(self, query):
+        self.calls.append(('find_one', query))
+        for record in self.records:
+            if _matches(record, query):
+                return asyncstorage.completed(dict(record))
+        return asyncstorage.completed(None)
+
+    def find(self, query, projection=None):
+        self.calls.append(('find', query, projection))
+        records = []
+        for record in self.records:
+            if _matches(record, query):
+                records.append(dict(
+                    (key, value) for key, value in record.items()
+                    if key not in (projection or {})
+                ))
+        return StubCursor(records)
+
+    def insert_one(self, value):
+        self.calls.append(('insert_one', value))
+        if any(record['_id'] == value['_id'] for record in self.records):
+            future = asyncstorage._new_future(asyncio.get_event_loop())
+            future.set_exception(DuplicateKeyError('duplicate key'))
+            return future
+        self.records.append(dict(value))
+        return asyncstorage.completed(None)
+
+    def update_many(self, query, update):
+        self.calls.append(('update_many', query, update))
+        for record in self.records:
+            if _matches(record, query):
+                record.update(update.get('$set', {}))
+                for key in update.get('$unset', {}):
+                    record.pop(key, None)
+        return asyncstorage.completed(None)
+
+    def delete_many(self, query):
+        self.calls.append(('delete_many', query))
+        self.records = [
+            record for record in self.records
+            if not _matches(record, query)
+        ]
+        return asyncstorage.completed(None)
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncMongoStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.collection = StubCollection()
+        self.storage = asyncstorage.AsyncMongoStorage(self.collection)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def wait(self, future):
+        return self.loop.run_until_complete(future)
+
+    def insert_posts(self):
+        for idx in range(5):
+            self.wait(self.storage.ainsert(
+                '_id', idx, {'title': 'post {0}'.format(idx), 'views': idx}
+            ))
+
+    def test_ainsert_and_aget(self):
+        self.insert_posts()
+        assert_equal(
+            self.wait(self.storage.aget('_id', 3)),
+            {'_id': 3, 'title': 'post 3', 'views': 3},
+        )
+        assert_is_none(self.wait(self.storage.aget('_id', 10)))
+
+    def test_ainsert_does_not_change_value(self):
+        value = {'title': 'hello'}
+        self.wait(self.storage.ainsert('_id', 1, value))
+        assert_equal(value, {'title': 'hello'})
+
+    def test_ainsert_duplicate(self):
+        self.insert_posts()
+        with assert_raises(exceptions.KeyExistsException):
+            self.wait(self.storage.ainsert('_id', 1, {'title': 'again'}))
+
+    def test_afind(self):
+        self.insert_posts()
+        records = self.wait(self.storage.afind(
+            Q('views', 'gte', 1), offset=1, limit=2, defer=['title'],
+        ))
+        assert_equal(records, [{'_id': 2, 'views': 2}, {'_id': 3, 'views': 3}])
+        assert_equal(
+            self.collection.calls[-1],
+            ('find', {'views': {'$gte': 1}}, {'title': False}),
+        )
+
+    def test_aupdate(self):
+        self.insert_posts()
+        self.wait(self.storage.aupdate(
+            Q('_id', 'eq', 2), {'views': 20}, unset=['title'],
+        ))
+        assert_equal(self.collection.calls[-1], (
+            'update_many',
+            {'_id': 2},
+            {'$set': {'views': 20}, '$unset': {'title': ''}},
+        ))
+        assert_equal(
+            self.wait(self.storage.aget('_id', 2)),
+            {'_id': 2, 'views': 20},
+        )
+
+    def test_empty_aupdate_is_skipped(self):
+        self.insert_posts()
+        calls = len(self.collection.calls)
+        assert_is_none(self.wait(self.storage.aupdate(Q('_id', 'eq', 2), {})))
+        assert_equal(len(self.collection.calls), calls)
+
+    def test_aremove(self):
+        self.insert_posts()
+        self.wait(self.storage.aremove(Q('views', 'gte', 3)))
+        records = self.wait(self.storage.afind())
+        assert_equal(sorted(record['_id'] for record in records), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from nose.tools import *  # PEP8 asserts
+
+from modularodm.exceptions import KeyExistsException
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import DbmStorage, dbmstorage
+
+
+class TestDbmStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.directory, 'db_')
+        self.storage = self.make_storage()
+        for idx in range(20):
+            self.storage.insert('_id', idx, {'_id': idx, 'parity': idx % 2})
+        self.storage.flush()
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.directory)
+
+    def make_storage(self):
+        return DbmStorage('test', prefix=self.prefix)
+
+    def count_loads(self):
+        return mock.patch.object(
+            dbmstorage.pickle, 'loads', side_effect=dbmstorage.pickle.loads
+        )
+
+    def test_records_persist(self):
+        self.storage.close()
+        self.storage = self.make_storage()
+        assert_equal(self.storage.get('_id', 7), {'_id': 7, 'parity': 1})
+
+    def test_get_reads_one_record(self):
+        with self.count_loads() as loads:
+            self.storage.get('_id', 3)
+        assert_equal(loads.call_count, 1)
+
+    def test_find_streams(self):
+        with self.count_loads() as loads:
+            results = self.storage.find(Q('parity', 'eq', 1))
+            assert_equal(loads.call_count, 0)
+            next(results)
+        assert_true(loads.call_count < 20)
+
+    def test_insert_duplicate(self):
+        with assert_raises(KeyExistsException):
+            self.storage.insert('_id', 3, {'_id': 3})
+
+    def test_update_and_remove(self):
+        self.storage.update(Q('parity', 'eq', 1), {'parity': 3})
+        assert_equal(
+            sorted(self.storage.find(Q('parity', 'eq', 3), by_pk=True)),
+            list(range(1, 20, 2)),
+        )
+        self.storage.remove(Q('parity', 'eq', 3))
+        assert_equal(
+            sorted(self.storage.find(by_pk=True)),
+            list(range(0, 20, 2)),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,6 +43,15 @@ class TestForeignList(ModularOdmTestCase):
     def test_get_slice_extended(self):
         assert_equal(self.bars[::-1], list(self.foo.bars[::-1]))
 
+    def test_iter_loads_in_one_batch(self):
+        self.Bar._clear_caches()
+        with self.spy(self.Bar, 'get_many') as get_many:
+            assert_equal(
+                [bar._id for bar in self.foo.bars],
+                list(range(5)),
+            )
+        get_many.assert_called_once_with('_id', list(range(5)))
+
 
 class TestAbstractForeignList(ModularOdmTestCase):
 
@@ -78,3 +87,11 @@ class TestAbstractForeignList(ModularOdmTestCase):
     def test_get_slice_extended(self):
         assert_equal(self.bars[::-1], list(self.foo.bars[::-1]))
 
+    def test_iter_loads_in_one_batch(self):
+        self.Bar._clear_caches()
+        with self.spy(self.Bar, 'get_many') as get_many:
+            assert_equal(
+                [bar._id for bar in self.foo.bars],
+                list(range(5)),
+            )
+        get_many.assert_called_once_with('_id', list(range(5)))
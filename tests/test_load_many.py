@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+
+from tests.base import ModularOdmTestCase
+
+
+class LoadManyTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Foo(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            value = fields.StringField()
+
+        return Foo,
+
+    def set_up_objects(self):
+        for idx in range(5):
+            self.Foo(_id=idx, value=str(idx)).save()
+        self.Foo._clear_caches()
+
+    def test_get_many(self):
+        records = self.Foo._storage[0].get_many('_id', [3, 1, 10])
+        assert_equal(sorted(records), [1, 3])
+        assert_equal(records[3]['value'], '3')
+
+    def test_load_many(self):
+        with self.spy(self.Foo, 'get_many') as get_many:
+            foos = self.Foo.load_many([3, 1, 10, 3])
+        assert_equal(get_many.call_count, 1)
+        assert_equal([foo and foo.value for foo in foos], ['3', '1', None, '3'])
+        assert_is(foos[0], foos[3])
+        assert_is(self.Foo.load(3), foos[0])
+
+    def test_cached_records_are_not_fetched(self):
+        cached = self.Foo.load(2)
+        with self.spy(self.Foo, 'get_many') as get_many:
+            foos = self.Foo.load_many([2, 4])
+        assert_equal(get_many.call_args[0][1], [4])
+        assert_is(foos[0], cached)
+        with self.spy(self.Foo, 'get_many') as get_many:
+            self.Foo.load_many([2, 4])
+        assert_equal(get_many.call_count, 0)
+
+    def test_casts_keys(self):
+        assert_equal([foo._id for foo in self.Foo.load_many(['1', '2'])], [1, 2])
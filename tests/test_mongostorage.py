@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import re
+import unittest
+from nose.tools import *  # PEP8 asserts
+
+from modularodm.query.querydialect import DefaultQueryDialect as Q
+from modularodm.storage import mongostorage
+from modularodm.storage.mongostorage import translate_query
+
+
+class TestUpdateDocument(unittest.TestCase):
+
+    def test_set_and_unset(self):
+        assert_equal(
+            mongostorage._update_document({'key': 1}, {'a': 1}, ['b']),
+            {'$set': {'a': 1}, '$unset': {'b': ''}},
+        )
+
+    def test_id_is_never_changed(self):
+        assert_equal(
+            mongostorage._update_document({'_id': 1}, {'_id': 1}, ['_id']),
+            None,
+        )
+        assert_equal(
+            mongostorage._update_document({'key': 1}, {}, ['_id', 'b']),
+            {'$unset': {'b': ''}},
+        )
+
+
+class TestTranslateQuery(unittest.TestCase):
+
+    def setUp(self):
+        mongostorage.TEMPLATE_CACHE.clear()
+        mongostorage.REGEX_CACHE.clear()
+
+    def test_translate(self):
+        query = (
+            (Q('name', 'eq', 'foo') | Q('count', 'gte', 3)) &
+            ~Q('tags', 'in', ['a', 'b'])
+        )
+        assert_equal(translate_query(query), {'$and': [
+            {'$or': [{'name': 'foo'}, {'count': {'$gte': 3}}]},
+            {'$nor': [{'tags': {'$in': ['a', 'b']}}] * 2},
+        ]})
+        assert_equal(translate_query(None), {})
+
+    def test_same_shape_reuses_template(self):
+        first = translate_query(Q('name', 'eq', 'foo') & Q('count', 'lt', 1))
+        second = translate_query(Q('name', 'eq', 'bar') & Q('count', 'lt', 2))
+        assert_equal(len(mongostorage.TEMPLATE_CACHE), 1)
+        assert_equal(first, {'$and': [{'name': 'foo'}, {'count': {'$lt': 1}}]})
+        assert_equal(second, {'$and': [{'name': 'bar'}, {'count': {'$lt': 2}}]})
+        assert_is_not(first['$and'][1], second['$and'][1])
+
+    def test_regexes_are_cached(self):
+        first = translate_query(Q('name', 'istartswith', 'a.b'))
+        second = translate_query(Q('name', 'istartswith', 'a.b'))
+        regex = first['name']['$regex']
+        assert_is(regex, second['name']['$regex'])
+        assert_equal(regex.flags & re.IGNORECASE, re.IGNORECASE)
+        assert_true(regex.match('A.Bc'))
+        assert_false(regex.match('axb'))
+
+    def test_merge(self):
+        mongo_query = {'count': {'$gt': 1}}
+        translate_query(Q('count', 'lt', 5), mongo_query)
+        assert_equal(mongo_query, {'count': {'$gt': 1, '$lt': 5}})
+
+    def test_rejects_other_objects(self):
+        with assert_raises(TypeError):
+            translate_query('name')
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = mongostorage.LRUCache(2)
+        cache.get('a', str.upper)
+        cache.get('b', str.upper)
+        cache.get('a', lambda key: None)
+        cache.get('c', str.upper)
+        assert_equal(len(cache), 2)
+        assert_equal(cache.get('a', lambda key: None), 'A')
+        assert_is_none(cache.get('b', lambda key: None))
+
+
+if __name__ == '__main__':
+    unittest.main()
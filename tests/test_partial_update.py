@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.query.query import RawQuery as Q
+
+from tests.base import ModularOdmTestCase
+
+
+class PartialUpdateTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Tag(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            name = fields.StringField()
+
+        class Post(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            title = fields.StringField()
+            body = fields.StringField()
+            tag = fields.ForeignField('tag', backref='posts')
+
+        class Item(StoredObject):
+            key = fields.IntegerField(primary=True)
+            name = fields.StringField()
+
+        return Tag, Post, Item
+
+    def set_up_objects(self):
+        self.tag = self.Tag(_id=1, name='news')
+        self.tag.save()
+        self.post = self.Post(_id=1, title='title', body='body', tag=self.tag)
+        self.post.save()
+
+    def test_sends_changed_fields_only(self):
+        self.post.title = 'new title'
+        with self.spy(self.Post, 'update') as update:
+            self.post.save()
+        assert_equal(update.call_count, 1)
+        assert_equal(update.call_args[0][1], {'title': 'new title'})
+        self.Post._clear_caches()
+        post = self.Post.load(1)
+        assert_equal(post.title, 'new title')
+        assert_equal(post.body, 'body')
+
+    def test_force_without_changes_writes_nothing(self):
+        with self.spy(self.Post, 'update') as update:
+            self.post.save(force=True)
+        assert_equal(update.call_count, 0)
+
+    def test_removed_keys_are_unset(self):
+        self.tag._StoredObject__backrefs = {}
+        with self.spy(self.Tag, 'update') as update:
+            self.tag.save(force=True)
+        assert_equal(update.call_args[1], {'unset': ['__backrefs']})
+        record = self.Tag._storage[0].get('_id', 1)
+        assert_not_in('__backrefs', record)
+
+    def test_keys_outside_the_schema_are_kept(self):
+        storage = self.Item._storage[0]
+        storage.insert('key', 1, {
+            'key': 1, 'name': 'old', '_version': 1, '_id': 'x', 'legacy': 1,
+        })
+        item = self.Item.load(1)
+        item.name = 'new'
+        with self.spy(self.Item, 'update') as update:
+            item.save()
+        assert_equal(update.call_args[1], {})
+        record = storage.get('key', 1)
+        assert_equal(
+            (record['name'], record['_id'], record['legacy']),
+            ('new', 'x', 1),
+        )
+
+    def test_backrefs_are_sent(self):
+        self.post.tag = None
+        with self.spy(self.Tag, 'update_many') as update:
+            self.post.save()
+        (key, data), = update.call_args[0][1]
+        assert_equal(list(data), ['__backrefs'])
+        self.Tag._clear_caches()
+        assert_equal(self.Tag.load(1).posts, [])
+
+    def test_keeps_fields_written_elsewhere(self):
+        # Another process changes the body behind the cache
+        self.Post._storage[0].update(Q('_id', 'eq', 1), {'body': 'theirs'})
+        self.post.title = 'mine'
+        self.post.save()
+        self.Post._clear_caches()
+        post = self.Post.load(1)
+        assert_equal((post.title, post.body), ('mine', 'theirs'))
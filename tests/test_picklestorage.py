@@ -0,0 +1,724 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import shutil
+import tempfile
+import threading
+import weakref
+import unittest
+import mock
+import pickle
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.exceptions import KeyExistsException, MultipleResultsFound
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import EphemeralStorage, PickleStorage, picklestorage
+
+
+class PickleStorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.directory, 'db_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_storage(self, **kwargs):
+        return PickleStorage('test', prefix=self.prefix, **kwargs)
+
+
+class TestJournal(PickleStorageTestCase):
+
+    def test_insert_appends_to_journal(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        assert_false(os.path.exists(storage.filename))
+        assert_true(os.path.getsize(storage.journal_filename) > 0)
+
+    def test_replay_on_load(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        storage.insert('_id', 3, {'_id': 3, 'value': 'three'})
+        storage.update(Q('_id', 'eq', 2), {'value': 'deux'})
+        storage.remove(Q('_id', 'eq', 3))
+        storage.flush()
+
+        reloaded = self.make_storage(journal=True)
+        assert_equal(
+            reloaded.store,
+            {1: {'_id': 1, 'value': 'one'}, 2: {'_id': 2, 'value': 'deux'}},
+        )
+
+    def test_load_folds_journal_into_snapshot(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.flush()
+
+        reloaded = self.make_storage(journal=True)
+        assert_true(os.path.exists(reloaded.filename))
+        assert_false(os.path.exists(reloaded.journal_filename))
+        assert_equal(self.make_storage().store, reloaded.store)
+
+    def test_replay_without_journal_mode(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        storage.flush()
+
+        reloaded = self.make_storage()
+        assert_equal(sorted(reloaded.store), [1, 2])
+        assert_false(os.path.exists(reloaded.journal_filename))
+        reloaded.insert('_id', 3, {'_id': 3, 'value': 'three'})
+        assert_equal(sorted(self.make_storage(journal=True).store), [1, 2, 3])
+
+    def test_truncated_record_discarded(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        storage.flush()
+        size = os.path.getsize(storage.journal_filename)
+        with open(storage.journal_filename, 'rb+') as fp:
+            fp.truncate(size - 3)
+
+        reloaded = self.make_storage(journal=True)
+        assert_equal(reloaded.store, {1: {'_id': 1, 'value': 'one'}})
+
+
+class TestCompaction(PickleStorageTestCase):
+
+    def test_compact(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.update(Q('_id', 'eq', 1), {'value': 'uno'})
+        storage.compact()
+        assert_false(os.path.exists(storage.journal_filename))
+        assert_equal(
+            self.make_storage().store,
+            {1: {'_id': 1, 'value': 'uno'}},
+        )
+
+    def test_writes_after_compaction_replayed(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.compact()
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        storage.flush()
+        reloaded = self.make_storage(journal=True)
+        assert_equal(sorted(reloaded.store), [1, 2])
+
+    def test_writes_during_compaction_replayed(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        write_snapshot = storage._write_snapshot
+
+        def write_during_dump(store=None):
+            storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+            storage.update(Q('_id', 'eq', 1), {'value': 'uno'})
+            write_snapshot(store)
+
+        storage._write_snapshot = write_during_dump
+        storage.compact()
+        assert_equal(sorted(picklestorage._read_records(storage.filename)), [1])
+
+        reloaded = self.make_storage(journal=True)
+        assert_equal(
+            reloaded.store,
+            {1: {'_id': 1, 'value': 'uno'}, 2: {'_id': 2, 'value': 'two'}},
+        )
+
+    def test_failed_compactions_keep_writes(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 0, {'_id': 0})
+        storage.compact()
+        storage.insert('_id', 1, {'_id': 1})
+        with mock.patch.object(storage, '_write_snapshot') as write_snapshot:
+            write_snapshot.side_effect = IOError()
+            with assert_raises(IOError):
+                storage.compact()
+            storage.insert('_id', 2, {'_id': 2})
+            with assert_raises(IOError):
+                storage.compact()
+        storage.flush()
+        reloaded = self.make_storage(journal=True)
+        assert_equal(sorted(reloaded.store), [0, 1, 2])
+
+    def test_background_compaction(self):
+        storage = self.make_storage(journal=True, compact_threshold=1)
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage._compactor.join()
+        assert_false(os.path.exists(storage.journal_filename))
+        assert_equal(self.make_storage().store, storage.store)
+
+    def test_compactions_do_not_overlap(self):
+        storage = self.make_storage(journal=True, compact_threshold=1)
+        write_snapshot = storage._write_snapshot
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(store=None):
+            if threading.current_thread() is storage._compactor:
+                started.set()
+                release.wait(5)
+            write_snapshot(store)
+
+        storage._write_snapshot = slow_write
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        started.wait(5)
+        storage.insert('_id', 2, {'_id': 2, 'value': 'two'})
+        compactor = threading.Thread(target=storage.compact)
+        compactor.start()
+        time.sleep(0.05)
+        release.set()
+        compactor.join()
+        storage._compactor.join()
+
+        reloaded = self.make_storage(journal=True)
+        assert_equal(sorted(reloaded.store), [1, 2])
+        assert_equal(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.tmp')],
+            [],
+        )
+
+
+class TestFlushPolicy(PickleStorageTestCase):
+
+    def test_flush_every_write(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        storage.update(Q('_id', 'eq', 1), {'value': 'uno'})
+        assert_equal(
+            self.make_storage().store,
+            {1: {'_id': 1, 'value': 'uno'}},
+        )
+
+    def test_flush_every_n_writes(self):
+        storage = self.make_storage(flush_every=3)
+        storage.insert('_id', 1, {'_id': 1})
+        storage.insert('_id', 2, {'_id': 2})
+        assert_false(os.path.exists(storage.filename))
+        storage.insert('_id', 3, {'_id': 3})
+        assert_equal(sorted(self.make_storage().store), [1, 2, 3])
+
+    def test_flush_explicit(self):
+        storage = self.make_storage(flush_every=None)
+        for idx in range(10):
+            storage.insert('_id', idx, {'_id': idx})
+        assert_false(os.path.exists(storage.filename))
+        storage.flush()
+        assert_equal(sorted(self.make_storage().store), list(range(10)))
+
+    def test_flush_interval(self):
+        storage = self.make_storage(flush_every=None, flush_interval=10)
+        storage.insert('_id', 1, {'_id': 1})
+        for _ in range(100):
+            if not storage._dirty:
+                break
+            time.sleep(0.01)
+        assert_equal(sorted(self.make_storage().store), [1])
+
+    def test_flush_at_exit(self):
+        storage = self.make_storage(flush_every=None)
+        storage.insert('_id', 1, {'_id': 1})
+        picklestorage._flush_at_exit(weakref.ref(storage))
+        assert_equal(sorted(self.make_storage().store), [1])
+
+    def test_failed_flush_keeps_previous_file(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1})
+        with mock.patch.object(picklestorage.pickle, 'dump') as dump:
+            dump.side_effect = IOError()
+            with assert_raises(IOError):
+                storage.insert('_id', 2, {'_id': 2})
+        assert_equal(sorted(self.make_storage().store), [1])
+        assert_equal(os.listdir(self.directory), ['db_test.pkl'])
+
+    def test_writes_matching_nothing_do_not_flush(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1})
+        with mock.patch.object(storage, '_flush') as flush:
+            storage.update(Q('_id', 'eq', 2), {'value': 'two'})
+            storage.modify(Q('_id', 'eq', 2), inc={'count': 1})
+            storage.remove(Q('_id', 'eq', 2))
+            storage.update_many('_id', [(2, {'value': 'two'})])
+            storage.insert_many('_id', [])
+        assert_equal(flush.call_count, 0)
+        assert_false(storage._dirty)
+
+    def test_batch_writes_flush_once(self):
+        storage = self.make_storage()
+        with mock.patch.object(storage, '_flush') as flush:
+            storage.insert_many('_id', [(idx, {'_id': idx}) for idx in range(5)])
+            storage.update_many('_id', [(idx, {'value': idx}) for idx in range(5)])
+        assert_equal(flush.call_count, 2)
+        assert_equal(storage.get('_id', 3), {'_id': 3, 'value': 3})
+
+    def test_insert_many_duplicate_inserts_nothing(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1})
+        with assert_raises(KeyExistsException):
+            storage.insert_many('_id', [(0, {'_id': 0}), (1, {'_id': 1})])
+        assert_equal(sorted(storage.store), [1])
+
+
+class TestFrozenRecords(PickleStorageTestCase):
+
+    def test_get_does_not_copy(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1, 'tags': ['a']})
+        assert_is(storage.get('_id', 1), storage.get('_id', 1))
+
+    def test_insert_isolated_from_caller(self):
+        storage = self.make_storage()
+        value = {'_id': 1, 'tags': ['a']}
+        storage.insert('_id', 1, value)
+        value['tags'].append('b')
+        assert_equal(storage.get('_id', 1)['tags'], ['a'])
+
+    def test_records_are_immutable(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1, 'tags': ['a']})
+        record = storage.get('_id', 1)
+        with assert_raises(TypeError):
+            record['tags'] = []
+        with assert_raises(AttributeError):
+            record['tags'].append('b')
+
+    def test_update_replaces_record(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1, 'value': 'one'})
+        record = storage.get('_id', 1)
+        storage.update(Q('_id', 'eq', 1), {'value': 'uno'})
+        assert_equal(record['value'], 'one')
+        assert_equal(storage.get('_id', 1)['value'], 'uno')
+
+    def test_loaded_fields_are_thawed(self):
+        class Doc(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            tags = fields.StringField(list=True)
+            meta = fields.DictionaryField()
+        Doc.set_storage(EphemeralStorage())
+        Doc(_id=1, tags=['a'], meta={'nested': {'values': [1]}}).save()
+        Doc._clear_caches()
+
+        doc = Doc.load(1)
+        assert_equal(type(doc.meta['nested']['values']), list)
+        doc.tags.append('b')
+        doc.meta['nested']['values'].append(2)
+        record = Doc._storage[0].get('_id', 1)
+        assert_equal(record['tags'], ['a'])
+        assert_equal(record['meta'], {'nested': {'values': [1]}})
+        assert_equal(sorted(doc.save()), ['meta', 'tags'])
+
+    def test_reload_frozen_snapshot(self):
+        storage = self.make_storage()
+        storage.insert('_id', 1, {'_id': 1, 'meta': {'tags': ['a']}})
+        assert_equal(
+            self.make_storage().get('_id', 1),
+            {'_id': 1, 'meta': {'tags': ['a']}},
+        )
+
+    def test_files_hold_builtin_types(self):
+        storage = self.make_storage(journal=True)
+        storage.insert('_id', 1, {'_id': 1, 'tags': ['a']})
+        storage.update(Q('_id', 'eq', 1), {'meta': {'tags': ['b']}})
+        storage.flush()
+        with open(storage.journal_filename, 'rb') as fp:
+            ops = [pickle.load(fp), pickle.load(fp)]
+        assert_equal(type(ops[0][2]), dict)
+        assert_equal(type(ops[0][2]['tags']), list)
+        assert_equal(type(ops[1][2]['meta']), dict)
+
+        storage.compact()
+        with open(storage.filename, 'rb') as fp:
+            record = pickle.load(fp)[1]
+        assert_equal(type(record), dict)
+        assert_equal(type(record['meta']['tags']), list)
+        assert_equal(
+            self.make_storage().get('_id', 1),
+            {'_id': 1, 'tags': ['a'], 'meta': {'tags': ['b']}},
+        )
+
+
+class TestHashIndex(PickleStorageTestCase):
+
+    def setUp(self):
+        super(TestHashIndex, self).setUp()
+        self.storage = self.make_storage()
+        self.storage._ensure_index('color')
+        for idx, color in enumerate(['red', 'green', 'red', 'blue']):
+            self.storage.insert('_id', idx, {'_id': idx, 'color': color})
+
+    def find_keys(self, query):
+        return sorted(self.storage.find(query, by_pk=True))
+
+    def test_eq(self):
+        assert_equal(self.find_keys(Q('color', 'eq', 'red')), [0, 2])
+        assert_in('color', self.storage._indexes)
+
+    def test_in(self):
+        assert_equal(
+            self.find_keys(Q('color', 'in', ['green', 'blue'])),
+            [1, 3],
+        )
+
+    def test_candidates(self):
+        assert_equal(
+            self.storage._index_candidates(Q('color', 'eq', 'red')),
+            set([0, 2]),
+        )
+        assert_is_none(
+            self.storage._index_candidates(Q('color', 'ne', 'red'))
+        )
+
+    def test_primary_key_uses_store(self):
+        assert_equal(
+            self.storage._index_candidates(Q('_id', 'in', [1, 5])),
+            set([1]),
+        )
+
+    def test_update(self):
+        self.find_keys(Q('color', 'eq', 'red'))
+        self.storage.update(Q('_id', 'eq', 0), {'color': 'blue'})
+        assert_equal(self.find_keys(Q('color', 'eq', 'red')), [2])
+        assert_equal(self.find_keys(Q('color', 'eq', 'blue')), [0, 3])
+
+    def test_remove(self):
+        self.find_keys(Q('color', 'eq', 'red'))
+        self.storage.remove(Q('_id', 'eq', 2))
+        assert_equal(self.find_keys(Q('color', 'eq', 'red')), [0])
+
+    def test_remove_all(self):
+        self.storage.remove()
+        assert_equal(self.storage.store, {})
+        assert_equal(self.find_keys(Q('color', 'eq', 'red')), [])
+
+    def test_list_values(self):
+        self.storage._ensure_index('tags')
+        self.storage.insert('_id', 4, {'_id': 4, 'tags': ['a', 'b']})
+        self.storage.insert('_id', 5, {'_id': 5, 'tags': ['b']})
+        assert_equal(self.find_keys(Q('tags', 'eq', 'b')), [4, 5])
+        assert_equal(self.find_keys(Q('tags', 'eq', 'a')), [4])
+
+    def test_unhashable_values_fall_back_to_scan(self):
+        self.storage._ensure_index('color')
+        self.storage.insert('_id', 4, {'_id': 4, 'color': {'r': 255}})
+        assert_equal(self.find_keys(Q('color', 'eq', {'r': 255})), [4])
+        assert_equal(self.find_keys(Q('color', 'eq', 'red')), [0, 2])
+        assert_false(self.storage._indexes['color'].valid)
+
+
+class TestOrderedIndex(PickleStorageTestCase):
+
+    def setUp(self):
+        super(TestOrderedIndex, self).setUp()
+        self.storage = self.make_storage()
+        self.storage._ensure_index('score')
+        for idx, score in enumerate([5, 3, 9, 3, 7]):
+            self.storage.insert('_id', idx, {'_id': idx, 'score': score})
+
+    def find_keys(self, query):
+        return sorted(self.storage.find(query, by_pk=True))
+
+    def test_ranges(self):
+        assert_equal(self.find_keys(Q('score', 'gt', 5)), [2, 4])
+        assert_equal(self.find_keys(Q('score', 'gte', 5)), [0, 2, 4])
+        assert_equal(self.find_keys(Q('score', 'lt', 5)), [1, 3])
+        assert_equal(self.find_keys(Q('score', 'lte', 5)), [0, 1, 3])
+
+    def test_range_candidates(self):
+        assert_equal(
+            self.storage._index_candidates(Q('score', 'lte', 3)),
+            set([1, 3]),
+        )
+        assert_equal(self.storage._indexes['score'].keys, [3, 5, 7, 9])
+
+    def test_keys_follow_writes(self):
+        self.find_keys(Q('score', 'gt', 0))
+        self.storage.remove(Q('_id', 'eq', 2))
+        self.storage.update(Q('_id', 'eq', 1), {'score': 4})
+        assert_equal(self.storage._indexes['score'].keys, [3, 4, 5, 7])
+        assert_equal(self.find_keys(Q('score', 'gt', 3)), [0, 1, 4])
+
+    def test_list_values_disable_ordering(self):
+        self.storage.insert('_id', 5, {'_id': 5, 'score': [1, 2]})
+        assert_equal(self.find_keys(Q('score', 'eq', 2)), [5])
+        assert_false(self.storage._indexes['score'].ordered)
+        assert_is_none(
+            self.storage._index_candidates(Q('score', 'gt', 5))
+        )
+
+
+    def test_iter_entries_during_writes(self):
+        index = self.storage._get_index('score')
+        entries = index.iter_entries()
+        assert_equal(next(entries), (3, set([1, 3])))
+        self.storage.remove(Q('score', 'eq', 5))
+        self.storage.insert('_id', 5, {'_id': 5, 'score': 4})
+        assert_equal(list(entries), [(5, set()), (7, set([4])), (9, set([2]))])
+
+
+class TestQueryPlanner(PickleStorageTestCase):
+
+    def setUp(self):
+        super(TestQueryPlanner, self).setUp()
+        self.storage = self.make_storage()
+        self.storage._ensure_index('status')
+        self.storage._ensure_index('created')
+        for idx in range(20):
+            self.storage.insert('_id', idx, {
+                '_id': idx,
+                'status': 'open' if idx % 2 else 'closed',
+                'created': idx,
+                'title': 'post {0}'.format(idx),
+            })
+
+    def find_keys(self, query):
+        return sorted(self.storage.find(query, by_pk=True))
+
+    def test_and_uses_most_selective_index(self):
+        query = Q('status', 'eq', 'open') & Q('created', 'gt', 15)
+        assert_equal(self.storage._plan(query)[0], 4)
+        assert_equal(self.storage._index_candidates(query), set(range(16, 20)))
+        assert_equal(self.find_keys(query), [17, 19])
+
+    def test_and_with_unindexed_residual(self):
+        query = Q('created', 'lt', 3) & Q('title', 'endswith', '1')
+        assert_equal(self.storage._index_candidates(query), set([0, 1, 2]))
+        assert_equal(self.find_keys(query), [1])
+
+    def test_or_unions_children(self):
+        query = Q('created', 'lt', 2) | Q('created', 'gte', 18)
+        assert_equal(
+            self.storage._index_candidates(query),
+            set([0, 1, 18, 19]),
+        )
+        assert_equal(self.find_keys(query), [0, 1, 18, 19])
+
+    def test_or_with_unindexed_child_scans(self):
+        query = Q('created', 'lt', 2) | Q('title', 'eq', 'post 5')
+        assert_is_none(self.storage._plan(query))
+        assert_equal(self.find_keys(query), [0, 1, 5])
+
+    def test_not_scans(self):
+        query = ~Q('status', 'eq', 'open')
+        assert_is_none(self.storage._plan(query))
+        assert_equal(self.find_keys(query), list(range(0, 20, 2)))
+
+    def test_nested(self):
+        query = (
+            (Q('status', 'eq', 'open') | Q('created', 'eq', 4)) &
+            Q('created', 'lte', 5)
+        )
+        assert_equal(self.find_keys(query), [1, 3, 4, 5])
+
+
+class TestLimitPushdown(PickleStorageTestCase):
+
+    def setUp(self):
+        super(TestLimitPushdown, self).setUp()
+        self.storage = self.make_storage()
+        for idx in range(50):
+            self.storage.insert('_id', idx, {'_id': idx, 'parity': idx % 2})
+        self.matched = []
+        compile_query = picklestorage.compile_query
+
+        def counting_compile_query(query):
+            match = compile_query(query)
+
+            def counting_match(record):
+                self.matched.append(record['_id'])
+                return match(record)
+            return counting_match
+
+        patcher = mock.patch.object(
+            picklestorage, 'compile_query', counting_compile_query
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_limit_stops_scan(self):
+        results = list(self.storage.find(Q('parity', 'eq', 1), limit=2))
+        assert_equal(len(results), 2)
+        assert_true(len(self.matched) < 10)
+
+    def test_offset_and_limit(self):
+        everything = list(self.storage.find(Q('parity', 'eq', 0), by_pk=True))
+        results = list(self.storage.find(
+            Q('parity', 'eq', 0), by_pk=True, offset=3, limit=4
+        ))
+        assert_equal(results, everything[3:7])
+
+    def test_find_one_stops_at_second_match(self):
+        with assert_raises(MultipleResultsFound):
+            self.storage.find_one(Q('parity', 'eq', 1))
+        assert_true(len(self.matched) < 10)
+
+    def test_find_one(self):
+        assert_equal(self.storage.find_one(Q('_id', 'eq', 7))['_id'], 7)
+
+
+class TestCompileQuery(unittest.TestCase):
+
+    record = {'_id': 1, 'name': 'Foo', 'tags': ['a', 'b']}
+
+    def test_raw_query(self):
+        assert_true(picklestorage.compile_query(Q('tags', 'eq', 'a'))(self.record))
+        assert_false(picklestorage.compile_query(Q('_id', 'gt', 1))(self.record))
+
+    def test_groups(self):
+        match = picklestorage.compile_query(
+            (Q('_id', 'eq', 1) & Q('name', 'startswith', 'F')) |
+            ~Q('tags', 'eq', 'c')
+        )
+        assert_true(match(self.record))
+        match = picklestorage.compile_query(~Q('tags', 'eq', 'a'))
+        assert_false(match(self.record))
+
+    def test_and_short_circuits(self):
+        match = picklestorage.compile_query(
+            Q('_id', 'eq', 2) & Q('missing', 'eq', 1)
+        )
+        assert_false(match(self.record))
+
+    def test_or_short_circuits(self):
+        match = picklestorage.compile_query(
+            Q('_id', 'eq', 1) | Q('missing', 'eq', 1)
+        )
+        assert_true(match(self.record))
+
+    def test_invalid_query(self):
+        with assert_raises(TypeError):
+            picklestorage.compile_query('_id')
+
+
+class TestIndexedSort(unittest.TestCase):
+
+    def setUp(self):
+        class Player(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            score = fields.IntegerField(index=True)
+        Player.set_storage(EphemeralStorage())
+        self.Player = Player
+        for idx, score in enumerate([5, 3, 9, 3, 7, 1]):
+            Player(_id=idx, score=score).save()
+
+    def test_sort_ascending(self):
+        results = self.Player.find().sort('score')
+        assert_equal([each._id for each in results], [5, 1, 3, 0, 4, 2])
+        results._fetch()
+        assert_is_not_none(results._sort_by_index(results._data, 'score'))
+
+    def test_sort_descending(self):
+        results = self.Player.find().sort('-score')
+        assert_equal([each._id for each in results], [2, 4, 0, 1, 3, 5])
+
+    def test_sort_with_limit(self):
+        results = self.Player.find().sort('-score').limit(2)
+        assert_equal([each._id for each in results], [2, 4])
+
+
+class TestSortWithLimit(unittest.TestCase):
+
+    def setUp(self):
+        class Post(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            category = fields.StringField()
+            votes = fields.IntegerField()
+        Post.set_storage(EphemeralStorage())
+        self.Post = Post
+        self.records = []
+        for idx in range(40):
+            post = Post(_id=idx, category='abc'[idx % 3], votes=idx % 7)
+            post.save()
+            self.records.append(post.to_storage())
+
+    def reference(self, keys, offset=0, limit=None):
+        records = self.records
+        for key in keys[::-1]:
+            records = sorted(
+                records,
+                key=lambda record: record[key.lstrip('-')],
+                reverse=key.startswith('-'),
+            )
+        stop = None if limit is None else offset + limit
+        return [record['_id'] for record in records[offset:stop]]
+
+    def assert_sorted(self, keys, offset=0, limit=None):
+        results = self.Post.find().sort(*keys).offset(offset)
+        if limit is not None:
+            results = results.limit(limit)
+        assert_equal(
+            [each._id for each in results],
+            self.reference(keys, offset, limit),
+        )
+
+    def test_single_key(self):
+        self.assert_sorted(['votes'], limit=5)
+        self.assert_sorted(['-votes'], limit=5)
+        self.assert_sorted(['-votes'], offset=3, limit=5)
+
+    def test_composite_key(self):
+        self.assert_sorted(['category', '-votes'], limit=7)
+        self.assert_sorted(['-category', 'votes'], offset=10, limit=7)
+        self.assert_sorted(['-votes', '-category'])
+
+    def test_limit_larger_than_results(self):
+        self.assert_sorted(['category', 'votes'], offset=30, limit=20)
+
+
+class TestStreamingQuerySet(unittest.TestCase):
+
+    def setUp(self):
+        class Item(StoredObject):
+            _id = fields.IntegerField(primary=True)
+        Item.set_storage(EphemeralStorage())
+        self.Item = Item
+        self.pulled = []
+
+    def make_query_set(self, count):
+        def source():
+            for idx in range(count):
+                self.pulled.append(idx)
+                yield {'_id': idx}
+        return picklestorage.PickleQuerySet(self.Item, source())
+
+    def test_iteration_is_lazy(self):
+        results = iter(self.make_query_set(100))
+        assert_equal(next(results)._id, 0)
+        assert_equal(self.pulled, [0])
+
+    def test_limit_stops_fetching(self):
+        results = self.make_query_set(100).offset(2).limit(3)
+        assert_equal([each._id for each in results], [2, 3, 4])
+        assert_equal(len(self.pulled), 5)
+
+    def test_len_with_limit(self):
+        results = self.make_query_set(100).limit(10)
+        assert_equal(len(results), 10)
+        assert_equal(len(self.pulled), 10)
+
+    def test_getitem(self):
+        results = self.make_query_set(100)
+        assert_equal(results[4]._id, 4)
+        assert_equal(len(self.pulled), 5)
+        with assert_raises(IndexError):
+            results[200]
+
+    def test_reiterate(self):
+        results = self.make_query_set(5)
+        assert_equal([each._id for each in results], list(range(5)))
+        assert_equal([each._id for each in results], list(range(5)))
+        assert_equal(len(self.pulled), 5)
+
+    def test_sort_fetches_all(self):
+        results = self.make_query_set(10).sort('-_id').limit(2)
+        assert_equal([each._id for each in results], [9, 8])
+        assert_equal(len(self.pulled), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
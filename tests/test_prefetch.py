@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields, exceptions
+from modularodm.query.query import RawQuery as Q
+
+from tests.base import ModularOdmTestCase
+
+
+class PrefetchTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Author(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            name = fields.StringField()
+
+        class Tag(StoredObject):
+            _id = fields.StringField(primary=True)
+
+        class Post(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            author = fields.ForeignField('author')
+            tags = fields.ForeignField('tag', list=True)
+            pinned = fields.AbstractForeignField()
+
+        return Author, Tag, Post
+
+    def set_up_objects(self):
+        authors = [self.Author(_id=idx, name=str(idx)) for idx in range(3)]
+        tags = [self.Tag(_id=name) for name in 'abc']
+        for each in authors + tags:
+            each.save()
+        for idx in range(6):
+            self.Post(
+                _id=idx,
+                author=authors[idx % 3],
+                tags=tags[:idx % 3],
+                pinned=tags[2] if idx % 2 else authors[0],
+            ).save()
+        for schema in (self.Author, self.Tag, self.Post):
+            schema._clear_caches()
+
+    def test_prefetch(self):
+        posts = self.Post.find().prefetch('author', 'tags', 'pinned')
+        with self.spy(self.Author, 'get_many') as get_many:
+            results = [
+                (post.author.name, [tag._id for tag in post.tags])
+                for post in posts
+            ]
+        assert_equal(
+            sorted(results),
+            sorted([(str(idx % 3), list('abc')[:idx % 3]) for idx in range(6)]),
+        )
+        assert_equal(get_many.call_count, 1)
+        assert_equal(sorted(get_many.call_args[0][1]), [0, 1, 2])
+        assert_true(self.Tag._is_cached('c'))
+
+    def test_batches(self):
+        posts = self.Post.find(Q('_id', 'lt', 5)).sort('_id')
+        posts = posts.prefetch('author')
+        posts.PREFETCH_BATCH_SIZE = 2
+        with self.spy(self.Author, 'get_many') as get_many:
+            assert_equal(len(list(posts)), 5)
+        # Authors of the batches are [0, 1], [2, 0], and [1]; the last batch
+        # is already cached
+        assert_equal(
+            [call[0][1] for call in get_many.call_args_list],
+            [[0, 1], [2]],
+        )
+
+    def test_sliced_query_sets_keep_prefetch(self):
+        posts = self.Post.find().prefetch('author')
+        assert_equal(posts[1:3]._prefetched, ('author',))
+
+    def test_rejects_other_fields(self):
+        with assert_raises(exceptions.QueryException):
+            self.Post.find().prefetch('title')
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import unittest
+import mock
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import EphemeralStorage
+
+from tests.base import ModularOdmTestCase
+
+
+class ProjectionTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Author(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            name = fields.StringField()
+
+        class Article(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            title = fields.StringField()
+            body = fields.StringField()
+            tags = fields.StringField(list=True)
+            author = fields.ForeignField('author', backref='articles')
+
+        return Author, Article
+
+    def set_up_objects(self):
+        self.author = self.Author(_id=1, name='Ada')
+        self.author.save()
+        for idx in range(3):
+            article = self.Article(
+                _id=idx,
+                title='title {0}'.format(idx),
+                body='body {0}'.format(idx),
+                tags=['tag {0}'.format(idx)],
+                author=self.author,
+            )
+            article.save()
+        self.Author._clear_caches()
+        self.Article._clear_caches()
+
+    def test_only(self):
+        articles = self.Article.find(Q('_id', 'lt', 2), only=['title'])
+        assert_equal(
+            [(each.title, each.body, each.tags) for each in articles.sort('_id')],
+            [('title 0', 'body 0', ['tag 0']), ('title 1', 'body 1', ['tag 1'])],
+        )
+
+    def test_defer(self):
+        article = self.Article.find(Q('_id', 'eq', 2), defer=['body'])[0]
+        assert_equal(article.title, 'title 2')
+        assert_equal(article.body, 'body 2')
+
+    def test_find_one(self):
+        article = self.Article.find_one(Q('_id', 'eq', 1), only=['title'])
+        assert_equal(article.body, 'body 1')
+
+    def test_deferred_backrefs(self):
+        author = self.Author.find_one(Q('_id', 'eq', 1), only=['name'])
+        assert_equal(
+            sorted(each._id for each in author.article__articles),
+            [0, 1, 2],
+        )
+
+    def test_save_keeps_deferred_fields(self):
+        article = self.Article.find_one(Q('_id', 'eq', 1), only=['title'])
+        article.title = 'changed'
+        assert_equal(list(article.save()), ['title'])
+        self.Article._clear_caches()
+        article = self.Article.load(1)
+        assert_equal(article.title, 'changed')
+        assert_equal(article.body, 'body 1')
+
+    def test_set_before_load(self):
+        article = self.Article.find_one(Q('_id', 'eq', 1), only=['title'])
+        article.body = 'new body'
+        assert_equal(article.body, 'new body')
+        assert_equal(list(article.save()), ['body'])
+
+
+class TestDeferredLoading(unittest.TestCase):
+
+    def setUp(self):
+        class Page(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            title = fields.StringField()
+            body = fields.StringField()
+            footer = fields.StringField()
+        self.storage = EphemeralStorage()
+        Page.set_storage(self.storage)
+        Page(_id=1, title='title', body='body', footer='footer').save()
+        Page._clear_caches()
+        self.Page = Page
+
+    def test_fields_are_left_out(self):
+        records = list(self.storage.find(defer=['body', 'footer']))
+        assert_equal(records, [{'_id': 1, 'title': 'title', '_version': 1}])
+
+    def test_deferred_fields_load_together(self):
+        page = self.Page.find(only=['title'])[0]
+        assert_equal(page._deferred, set(['body', 'footer', '__backrefs']))
+        with mock.patch.object(
+                self.storage, 'get', wraps=self.storage.get) as get:
+            assert_equal(page.title, 'title')
+            assert_equal(get.call_count, 0)
+            assert_equal(page.body, 'body')
+            assert_equal(page.footer, 'footer')
+            assert_equal(get.call_count, 1)
+        assert_equal(page._deferred, set())
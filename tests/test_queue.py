@@ -84,6 +84,10 @@ class QueueTestCase(unittest.TestCase):
         self.Model = make_model()
         self.Model.queue.clear()
 
+    def tearDown(self):
+        # The queue is shared by all models, so stop it for later tests
+        self.Model.cancel_queue()
+
     def enqueue_record(self, _id=1):
         record = self.Model(_id=_id)
         record.save()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields, exceptions
+from modularodm.validators import MinValueValidator
+
+from tests.base import ModularOdmTestCase
+
+
+class SaveAllTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Foo(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            value = fields.IntegerField(validate=MinValueValidator(0))
+
+        return Foo,
+
+    def set_up_objects(self):
+        self.existing = [self.Foo(_id=idx, value=idx) for idx in range(3)]
+        for foo in self.existing:
+            foo.save()
+
+    def test_inserts_in_one_call(self):
+        foos = [self.Foo(_id=idx, value=idx) for idx in range(10, 15)]
+        with self.spy(self.Foo, 'insert_many') as insert_many:
+            self.Foo.save_all(foos)
+        assert_equal(insert_many.call_count, 1)
+        self.Foo._clear_caches()
+        assert_equal(
+            [self.Foo.load(idx).value for idx in range(10, 15)],
+            list(range(10, 15)),
+        )
+
+    def test_updates_and_inserts(self):
+        self.existing[1].value = 100
+        new = self.Foo(_id=20, value=20)
+        with self.spy(self.Foo, 'update_many') as update_many:
+            changed = self.Foo.save_all(self.existing + [new])
+        assert_equal(update_many.call_count, 1)
+        assert_equal(changed[0], [])
+        assert_equal(changed[1], set(['value']))
+        assert_in('_id', changed[3])
+        self.Foo._clear_caches()
+        assert_equal(self.Foo.load(1).value, 100)
+        assert_equal(self.Foo.load(20).value, 20)
+
+    def test_validation_error_writes_nothing(self):
+        foos = [self.Foo(_id=30, value=1), self.Foo(_id=31, value=-1)]
+        with assert_raises(exceptions.ValidationError):
+            self.Foo.save_all(foos)
+        self.Foo._clear_caches()
+        assert_is_none(self.Foo.load(30))
+
+    def test_existing_key_writes_nothing(self):
+        foos = [self.Foo(_id=50, value=50), self.Foo(_id=0, value=0)]
+        with assert_raises(exceptions.KeyExistsException):
+            self.Foo.save_all(foos)
+        self.Foo._clear_caches()
+        assert_is_none(self.Foo.load(50))
+        self.Foo.save_all([self.Foo(_id=50, value=50)])
+        assert_equal(self.Foo.load(50).value, 50)
+
+    def test_saved_objects_are_cached(self):
+        foo = self.Foo(_id=40, value=40)
+        self.Foo.save_all([foo])
+        assert_true(foo._is_loaded)
+        assert_is(self.Foo.load(40), foo)
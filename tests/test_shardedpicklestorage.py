@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from nose.tools import *  # PEP8 asserts
+
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import ShardedPickleStorage, shardedpicklestorage
+
+
+class TestShardedPickleStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.directory, 'db_')
+        self.storage = self.make_storage()
+        for idx in range(40):
+            self.storage.insert('_id', idx, {'_id': idx, 'value': idx * 2})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_storage(self, **kwargs):
+        return ShardedPickleStorage('test', shards=4, prefix=self.prefix, **kwargs)
+
+    def test_shards_are_stable(self):
+        assert_equal(shardedpicklestorage.shard_for(u'abc', 8),
+                     shardedpicklestorage.shard_for(b'abc', 8))
+        assert_equal(shardedpicklestorage.shard_for(12, 8),
+                     shardedpicklestorage.shard_for(u'12', 8))
+
+    def test_records_are_partitioned(self):
+        for filename in self.storage.shard_filenames:
+            assert_true(os.path.exists(filename))
+        reloaded = self.make_storage()
+        assert_equal(len(reloaded.store), 40)
+        assert_equal(reloaded.get('_id', 7)['value'], 14)
+
+    def test_flush_rewrites_dirty_shards_only(self):
+        storage = self.make_storage(flush_every=None)
+        storage.update(Q('_id', 'eq', 5), {'value': -1})
+        assert_equal(
+            storage.store.dirty,
+            set([shardedpicklestorage.shard_for(5, 4)]),
+        )
+        with mock.patch.object(shardedpicklestorage, '_write_records') as write:
+            storage.flush()
+        assert_equal(
+            [call[0][1] for call in write.call_args_list],
+            [storage.shard_filenames[shardedpicklestorage.shard_for(5, 4)]],
+        )
+        assert_equal(storage.store.dirty, set())
+
+    def test_shards_load_lazily(self):
+        reloaded = self.make_storage()
+        assert_equal(reloaded.store.shards, {})
+        reloaded.get('_id', 3)
+        assert_equal(
+            list(reloaded.store.shards),
+            [shardedpicklestorage.shard_for(3, 4)],
+        )
+
+    def test_remove(self):
+        self.storage.remove(Q('value', 'gte', 40))
+        reloaded = self.make_storage()
+        assert_equal(sorted(reloaded.find(by_pk=True)), list(range(20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
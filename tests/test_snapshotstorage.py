@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.exceptions import DatabaseError
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import PickleStorage, SnapshotStorage, snapshotstorage
+
+
+class TestSnapshotStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        source = PickleStorage(
+            'country', prefix=os.path.join(self.directory, 'db_')
+        )
+        for idx, name in enumerate(['Chile', 'Japan', 'Kenya', 'Peru']):
+            source.insert('_id', name.lower()[:2], {
+                '_id': name.lower()[:2],
+                'name': name,
+                'rank': idx,
+            })
+        self.filename = os.path.join(self.directory, 'country.snap')
+        assert_equal(snapshotstorage.export(source, self.filename), 4)
+        self.storage = SnapshotStorage(self.filename)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.directory)
+
+    def test_get(self):
+        assert_equal(
+            self.storage.get('_id', 'ja'),
+            {'_id': 'ja', 'name': 'Japan', 'rank': 1},
+        )
+        assert_is_none(self.storage.get('_id', 'xx'))
+
+    def test_find(self):
+        assert_equal(
+            sorted(self.storage.find(Q('rank', 'gte', 2), by_pk=True)),
+            ['ke', 'pe'],
+        )
+        assert_equal(
+            self.storage.find_one(Q('_id', 'eq', 'pe'))['name'],
+            'Peru',
+        )
+
+    def test_primary_key_lookup_reads_one_record(self):
+        read = []
+        original = self.storage._read
+        self.storage._read = lambda key: read.append(key) or original(key)
+        list(self.storage.find(Q('_id', 'in', ['ch', 'xx'])))
+        assert_equal(read, ['ch'])
+
+    def test_repeated_keys_match_once(self):
+        assert_equal(
+            list(self.storage.find(Q('_id', 'in', ['pe', 'ch', 'pe']), by_pk=True)),
+            ['pe', 'ch'],
+        )
+
+    def test_failed_export_removes_temporary_file(self):
+        class Broken(object):
+            def find(self):
+                yield {'_id': 'ok'}
+                raise IOError()
+        filename = os.path.join(self.directory, 'broken.snap')
+        with assert_raises(IOError):
+            snapshotstorage.export(Broken(), filename)
+        assert_false(os.path.exists(filename))
+        assert_false(os.path.exists(filename + '.tmp'))
+
+    def test_read_only(self):
+        with assert_raises(DatabaseError):
+            self.storage.insert('_id', 'fr', {'_id': 'fr'})
+        with assert_raises(DatabaseError):
+            self.storage.remove(Q('_id', 'eq', 'ch'))
+
+    def test_rejects_other_files(self):
+        filename = os.path.join(self.directory, 'other')
+        with open(filename, 'wb') as fp:
+            fp.write(b'not a snapshot at all')
+        with assert_raises(DatabaseError):
+            SnapshotStorage(filename)
+
+    def test_stored_objects(self):
+        class Country(StoredObject):
+            _id = fields.StringField(primary=True)
+            name = fields.StringField()
+            rank = fields.IntegerField()
+        Country.set_storage(self.storage)
+        assert_equal(Country.load('ke').name, 'Kenya')
+        results = Country.find(Q('rank', 'lt', 3)).sort('-rank').limit(2)
+        assert_equal([each.name for each in results], ['Kenya', 'Japan'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import datetime
+import tempfile
+import threading
+import unittest
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.exceptions import KeyExistsException, MultipleResultsFound
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage import SQLiteStorage, sqlitestorage
+
+
+class TestSQLiteStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.sqlite3')
+        self.storage = SQLiteStorage(self.filename, 'test')
+        for idx in range(10):
+            self.storage.insert('_id', idx, {
+                '_id': idx,
+                'score': idx % 4,
+                'name': 'name {0}'.format(idx),
+                'tags': ['even' if idx % 2 == 0 else 'odd', idx],
+                'note': None,
+            })
+
+    def tearDown(self):
+        self.storage.connection.close()
+        shutil.rmtree(self.directory)
+
+    def find_keys(self, query):
+        return sorted(self.storage.find(query, by_pk=True))
+
+    def test_records_persist(self):
+        reopened = SQLiteStorage(self.filename, 'test')
+        assert_equal(reopened.get('_id', 3)['name'], 'name 3')
+        assert_equal(reopened.find(Q('tags', 'eq', 'odd')).count(), 5)
+
+    def test_insert_duplicate(self):
+        with assert_raises(KeyExistsException):
+            self.storage.insert('_id', 3, {'_id': 3})
+
+    def test_update(self):
+        self.storage.update(Q('score', 'eq', 1), {'name': 'updated', 'note': 'x'})
+        assert_equal(self.find_keys(Q('name', 'eq', 'updated')), [1, 5, 9])
+        assert_equal(self.storage.get('_id', 5)['note'], 'x')
+        self.storage.update(Q('_id', 'eq', 5), {'note': None})
+        assert_is_none(self.storage.get('_id', 5)['note'])
+
+    def test_remove(self):
+        self.storage.remove(Q('score', 'gte', 2))
+        assert_equal(self.find_keys(None), [0, 1, 4, 5, 8, 9])
+        self.storage.remove()
+        assert_equal(self.find_keys(None), [])
+
+    def test_list_fields_match_elements(self):
+        assert_equal(self.find_keys(Q('tags', 'eq', 'even')), [0, 2, 4, 6, 8])
+        assert_equal(self.find_keys(Q('tags', 'eq', 3)), [3])
+        assert_equal(self.find_keys(Q('tags', 'eq', ['odd', 3])), [3])
+
+    def test_null_values(self):
+        assert_equal(len(self.find_keys(Q('note', 'eq', None))), 10)
+        assert_equal(self.find_keys(Q('note', 'ne', None)), [])
+        assert_equal(len(self.find_keys(Q('note', 'nin', ['x']))), 10)
+
+    def test_string_operators(self):
+        self.storage.insert('_id', 10, {'_id': 10, 'name': 'Name 10%_'})
+        assert_equal(self.find_keys(Q('name', 'startswith', 'name 1')), [1])
+        assert_equal(self.find_keys(Q('name', 'endswith', '0%_')), [10])
+        assert_equal(self.find_keys(Q('name', 'contains', 'ame 1')), [1, 10])
+        assert_equal(self.find_keys(Q('name', 'contains', 'name 1')), [1])
+        assert_equal(self.find_keys(Q('name', 'icontains', 'NAME 1')), [1, 10])
+
+    def test_query_groups(self):
+        query = (Q('score', 'eq', 1) | Q('score', 'eq', 2)) & ~Q('_id', 'lt', 5)
+        assert_equal(self.find_keys(query), [5, 6, 9])
+
+    def test_find_one(self):
+        assert_equal(self.storage.find_one(Q('_id', 'eq', 4))['_id'], 4)
+        with assert_raises(MultipleResultsFound):
+            self.storage.find_one(Q('score', 'eq', 0))
+
+    def test_sort_skip_limit(self):
+        cursor = self.storage.find(by_pk=True)
+        cursor.sort([('score', True), ('_id', False)]).skip(1).limit(3)
+        assert_equal(list(cursor), [7, 2, 6])
+        assert_equal(cursor.count(), 3)
+
+    def test_modify_from_other_connections(self):
+        def work():
+            storage = SQLiteStorage(self.filename, 'test')
+            for _ in range(50):
+                storage.modify(Q('_id', 'eq', 1), inc={'score': 1})
+            storage.connection.close()
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert_equal(self.storage.get('_id', 1)['score'], 201)
+
+    def test_index_is_used(self):
+        self.storage._ensure_index('score')
+        condition, params = self.storage._translate(Q('score', 'eq', 2))
+        plan = self.storage._execute(
+            'EXPLAIN QUERY PLAN SELECT data FROM {0} WHERE {1}'.format(
+                self.storage.table, condition,
+            ),
+            params,
+        )
+        assert_in('test__score', ' '.join(row[-1] for row in plan))
+
+    def test_translate_query_is_parameterized(self):
+        condition, params = sqlitestorage.translate_query(
+            Q('name', 'eq', "'; DROP TABLE test; --")
+        )
+        assert_equal(condition, 'json_extract(data, \'$."name"\') IS ?')
+        assert_equal(params, ["'; DROP TABLE test; --"])
+
+
+class TestSQLiteStoredObject(unittest.TestCase):
+
+    def setUp(self):
+        class Event(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            title = fields.StringField(index=True)
+            date = fields.DateTimeField()
+        Event.set_storage(SQLiteStorage(':memory:', 'event'))
+        self.Event = Event
+        for idx in range(5):
+            Event(
+                _id=idx,
+                title='event {0}'.format(idx),
+                date=datetime.datetime(2014, 1, idx + 1),
+            ).save()
+        Event._clear_caches()
+
+    def test_datetimes_round_trip(self):
+        event = self.Event.load(2)
+        assert_equal(event.date, datetime.datetime(2014, 1, 3))
+
+    def test_query_on_datetime(self):
+        results = self.Event.find(
+            Q('date', 'gt', datetime.datetime(2014, 1, 3))
+        ).sort('-date')
+        assert_equal([each._id for each in results], [4, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
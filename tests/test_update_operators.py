@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from nose.tools import *  # PEP8 asserts
+
+from modularodm import StoredObject, fields
+from modularodm.query.query import RawQuery as Q
+from modularodm.storage.base import apply_operators
+
+from tests.base import ModularOdmTestCase
+
+
+class UpdateOperatorsTestCase(ModularOdmTestCase):
+
+    def define_objects(self):
+        class Tag(StoredObject):
+            _id = fields.IntegerField(primary=True)
+
+        class Page(StoredObject):
+            _id = fields.IntegerField(primary=True)
+            views = fields.IntegerField(default=0)
+            tags = fields.StringField(list=True)
+            related = fields.ForeignField('tag', list=True, backref='pages')
+
+        return Tag, Page
+
+    def set_up_objects(self):
+        self.tag = self.Tag(_id=1)
+        self.tag.save()
+        self.page = self.Page(_id=1, tags=['a', 'b'])
+        self.page.save()
+
+    def reload(self):
+        self.Page._clear_caches()
+        return self.Page.load(1)
+
+    def test_inc(self):
+        self.Page.update_one(1, inc={'views': 2})
+        self.Page.update_one(self.page, inc={'views': 1})
+        assert_equal(self.page.views, 3)
+        assert_equal(self.reload().views, 3)
+
+    def test_list_operators(self):
+        self.Page.update_one(self.page, push={'tags': 'a'})
+        self.Page.update_one(self.page, add_to_set={'tags': 'b'})
+        self.Page.update_one(self.page, add_to_set={'tags': 'c'})
+        self.Page.update_one(self.page, pull={'tags': 'a'})
+        assert_equal(list(self.page.tags), ['b', 'c'])
+        assert_equal(list(self.reload().tags), ['b', 'c'])
+
+    def test_data_and_operators(self):
+        self.Page.update_one(
+            Q('_id', 'eq', 1), data={'tags': ['x']}, inc={'views': 5}
+        )
+        page = self.reload()
+        assert_equal((page.views, list(page.tags)), (5, ['x']))
+
+    def test_cache_is_patched(self):
+        self.Page.update_one(self.page, inc={'views': 1})
+        assert_false(self.page._dirty)
+        with self.spy(self.Page, 'get') as get:
+            assert_equal(self.Page.load(1).views, 1)
+            # Nothing changed since the write, so saving writes nothing
+            with self.spy(self.Page, 'update') as update:
+                self.page.save(force=True)
+        assert_equal(get.call_count, 0)
+        assert_equal(update.call_count, 0)
+
+    def test_foreign_operators_keep_backrefs(self):
+        self.Page.update_one(self.page, push={'related': self.tag})
+        assert_equal([each._id for each in self.page.related], [1])
+        assert_equal([each._id for each in self.tag.pages], [1])
+        self.Page.update_one(self.page, pull={'related': self.tag})
+        assert_equal(list(self.reload().related), [])
+        assert_equal(self.tag.pages, [])
+
+
+def test_apply_operators():
+    record = {'views': 1, 'tags': ('a',)}
+    assert_equal(
+        apply_operators(
+            record,
+            inc={'views': 1, 'likes': 2},
+            push={'tags': 'b', 'links': 'c'},
+            pull={'tags': 'a'},
+        ),
+        {'views': 2, 'likes': 2, 'tags': ['b'], 'links': ['c']},
+    )
+    assert_equal(record, {'views': 1, 'tags': ('a',)})
+
+
+def test_apply_operators_to_null_values():
+    record = {'views': None, 'tags': None, 'title': 'title'}
+    for operators in (
+            {'inc': {'views': 1}},
+            {'push': {'tags': 'a'}},
+            {'add_to_set': {'tags': 'a'}},
+            {'pull': {'tags': 'a'}},
+            {'push': {'title': 'a'}},
+            {'inc': {'title': 1}}):
+        with assert_raises(TypeError):
+            apply_operators(record, **operators)